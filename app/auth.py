@@ -0,0 +1,61 @@
+from flask import current_app
+from flask_login import UserMixin
+from sqlalchemy import event
+from app import db
+from app.cache import response_cache
+from app.model import User, Product
+
+# Fields of the signed-in user that the layout and permission checks read on
+# every request. They are cached (see app/cache.py) so drawing the navbar
+# costs no database round trips; anything else is loaded on first use.
+DISPLAY_FIELDS = ('id', 'username', 'role', 'is_admin', 'unread_notification_count', 'has_products')
+
+
+class CurrentUser(UserMixin):
+    """What Flask-Login's current_user holds: cached display data, with the User row behind it on demand."""
+
+    def __init__(self, data):
+        for field in DISPLAY_FIELDS:
+            setattr(self, field, data[field])
+        self._user = None
+
+    def __getattr__(self, name):
+        # Only called for attributes not cached above (e.g. email)
+        if name.startswith('_'):
+            raise AttributeError(name)
+        if self._user is None:
+            self._user = db.session.get(User, self.id)
+        return getattr(self._user, name)
+
+
+def load_current_user(user_id):
+    def load():
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        has_products = db.session.query(Product.query.filter_by(user_id=user_id).exists()).scalar()
+        return {
+            'id': user.id,
+            'username': user.username,
+            'role': user.role,
+            'is_admin': bool(user.is_admin),
+            'unread_notification_count': user.unread_notification_count or 0,
+            'has_products': has_products,
+        }
+
+    data = response_cache.fragment('user', user_id, [f'user:{user_id}'], load,
+                                   ttl=current_app.config['USER_CACHE_TTL'])
+    return CurrentUser(data) if data else None
+
+
+def invalidate_user(user_id):
+    """Reloads the user's cached display data once the current transaction commits."""
+    if user_id is not None:
+        response_cache.invalidate(f'user:{user_id}')
+
+
+@event.listens_for(User.username, 'set')
+@event.listens_for(User.role, 'set')
+@event.listens_for(User.is_admin, 'set')
+def _display_field_changed(target, value, oldvalue, initiator):
+    invalidate_user(target.id)
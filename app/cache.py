@@ -0,0 +1,197 @@
+import json
+import threading
+import time
+from collections import Counter, OrderedDict
+from functools import wraps
+from flask import current_app, make_response, request, session
+from flask_login import current_user
+from sqlalchemy import event
+from app import db
+
+
+class LRUBackend:
+    """
+    Keeps entries in this process, evicting the least recently used ones past
+    max_entries. Counters are bounded the same way by max_counters; a counter
+    that isn't kept reads as the highest value ever evicted, so no counter
+    goes back to a version an older entry was cached under.
+    """
+
+    def __init__(self, max_entries=1024, max_counters=10000):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._counters = OrderedDict()
+        self._counter_floor = 0
+        self._max_entries = max_entries
+        self._max_counters = max_counters
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, self._counter_floor) + 1
+            self._counters.move_to_end(key)
+            while len(self._counters) > self._max_counters:
+                _, value = self._counters.popitem(last=False)
+                self._counter_floor = max(self._counter_floor, value)
+
+    def counters(self, keys):
+        with self._lock:
+            values = []
+            for key in keys:
+                if key in self._counters:
+                    self._counters.move_to_end(key)
+                values.append(self._counters.get(key, self._counter_floor))
+            return values
+
+
+class RedisBackend:
+    """Shares entries and invalidations between every worker process through Redis."""
+
+    def __init__(self, url, prefix='cache:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("The 'redis' package is required for a redis:// CACHE_URL.")
+        self._redis = redis.Redis.from_url(url)
+        self._prefix = prefix
+
+    def get(self, key):
+        value = self._redis.get(self._prefix + key)
+        return json.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl):
+        self._redis.set(self._prefix + key, json.dumps(value), ex=ttl)
+
+    def incr(self, key):
+        self._redis.incr(self._prefix + key)
+
+    def counters(self, keys):
+        if not keys:
+            return []
+        return [int(value or 0) for value in self._redis.mget([self._prefix + key for key in keys])]
+
+
+class ResponseCache:
+    """
+    Caches whole pages for anonymous visitors and rendered fragments for
+    everyone. Every key embeds the current version of its tags (e.g.
+    'tutorials', 'tutorial:7'); invalidate() bumps those versions when the
+    transaction commits, so stale entries are never read again and simply
+    age out of the backend.
+    """
+
+    def __init__(self, backend=None):
+        self._backend = backend or LRUBackend()
+        self._stats_lock = threading.Lock()
+        self.hits = Counter()
+        self.misses = Counter()
+        self.ttl = 300
+
+    def init_app(self, app):
+        app.config.setdefault('CACHE_TTL', 300)  # Upper bound on staleness for changes nothing invalidates
+        app.config.setdefault('CACHE_MAX_ENTRIES', 1024)
+        app.config.setdefault('CACHE_MAX_TAGS', 10000)  # Invalidation counters kept in memory
+        self.ttl = app.config['CACHE_TTL']
+        url = app.config.get('CACHE_URL')
+        if url and url.startswith('redis://'):
+            self._backend = RedisBackend(url)
+        else:
+            self._backend = LRUBackend(app.config['CACHE_MAX_ENTRIES'], app.config['CACHE_MAX_TAGS'])
+
+    def cached(self, *tags):
+        """
+        Caches a GET view's response for anonymous visitors. Tags can refer to
+        the view's arguments, e.g. 'tutorial:{tutorial_id}'.
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(**kwargs):
+                # Signed-in pages and pending flash messages are per visitor
+                if request.method != 'GET' or current_user.is_authenticated or '_flashes' in session:
+                    return view(**kwargs)
+                key = self._key('page', request.full_path, [tag.format(**kwargs) for tag in tags])
+                entry = self._backend.get(key)
+                self._record(request.endpoint, entry is not None)
+                if entry is not None:
+                    response = current_app.response_class(entry['body'], mimetype=entry['mimetype'])
+                    response.headers['X-Cache'] = 'HIT'
+                    return response
+                response = make_response(view(**kwargs))
+                if response.status_code == 200 and not response.direct_passthrough and not session.modified:
+                    self._backend.set(key, {'body': response.get_data(as_text=True), 'mimetype': response.mimetype}, self.ttl)
+                response.headers['X-Cache'] = 'MISS'
+                return response
+            return wrapper
+        return decorator
+
+    def fragment(self, name, variant, tags, render, ttl=None):
+        """Returns the cached result of render() (JSON-serialisable) for this name and variant."""
+        key = self._key('fragment', f"{name}:{variant}", tags)
+        value = self._backend.get(key)
+        self._record(name, value is not None)
+        if value is None:
+            value = render()
+            if value is not None:
+                self._backend.set(key, value, ttl or self.ttl)
+        return value
+
+    def invalidate(self, *tags):
+        """Expires every page and fragment carrying one of tags once the current transaction commits."""
+        db.session.info.setdefault('cache_tags', set()).update(tags)
+
+    def bump(self, tags):
+        for tag in tags:
+            self._backend.incr(f'tag:{tag}')
+
+    def stats(self):
+        with self._stats_lock:
+            names = sorted(set(self.hits) | set(self.misses))
+            hits, misses = sum(self.hits.values()), sum(self.misses.values())
+            return {
+                'backend': type(self._backend).__name__,
+                'hits': hits,
+                'misses': misses,
+                'hit_ratio': round(hits / (hits + misses), 3) if hits + misses else None,
+                'by_name': {name: {'hits': self.hits[name], 'misses': self.misses[name]} for name in names},
+            }
+
+    def _key(self, kind, name, tags):
+        versions = self._backend.counters([f'tag:{tag}' for tag in tags])
+        return f"{kind}:{name}|{'.'.join(map(str, versions))}"
+
+    def _record(self, name, hit):
+        with self._stats_lock:
+            (self.hits if hit else self.misses)[name] += 1
+
+
+response_cache = ResponseCache()
+
+
+@event.listens_for(db.session, 'after_commit')
+def _bump_tags(session):
+    tags = session.info.pop('cache_tags', None)
+    if tags:
+        response_cache.bump(tags)
+
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _discard_tags(session, previous_transaction):
+    if previous_transaction.parent is None:  # Ignore savepoint rollbacks
+        session.info.pop('cache_tags', None)
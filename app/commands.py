@@ -0,0 +1,66 @@
+from flask import g
+from app import app, db
+from app.jobs import enqueue, workers
+from app.model import Product, Tutorial
+from app.storage import collect_garbage
+from app.uploads import VIDEO_EXTENSIONS, expire_uploads
+
+
+@app.cli.command('run-jobs')
+def run_jobs():
+    """Process background jobs in the foreground (use with JOB_WORKERS=0 on web processes)."""
+    workers.work()
+
+
+@app.cli.command('process-images')
+def process_images():
+    """Queue resizing for every product image that has no variants yet."""
+    product_ids = [pid for (pid,) in db.session.query(Product.id).filter(Product.image_variants.is_(None))]
+    for product_id in product_ids:
+        enqueue('process_product_image', product_id=product_id)
+    db.session.commit()
+    print(f"Queued {len(product_ids)} product images for processing.")
+
+
+@app.cli.command('transcode-videos')
+def transcode_videos():
+    """Queue HLS transcoding for every uploaded tutorial video that has no renditions yet."""
+    rows = db.session.query(Tutorial.id, Tutorial.file_path).filter(
+        Tutorial.file_path.isnot(None), Tutorial.hls_playlist.is_(None))
+    tutorial_ids = [tid for tid, file_path in rows if file_path.rsplit('.', 1)[-1].lower() in VIDEO_EXTENSIONS]
+    for tutorial_id in tutorial_ids:
+        enqueue('transcode_tutorial_video', tutorial_id=tutorial_id)
+    db.session.commit()
+    print(f"Queued {len(tutorial_ids)} tutorials for transcoding.")
+
+
+@app.cli.command('gc-blobs')
+def gc_blobs():
+    """Delete uploaded files that no product or tutorial references any more."""
+    g.write_transaction = True
+    reclaimed = collect_garbage()
+    db.session.commit()
+    print(f"Reclaimed {reclaimed} unreferenced uploads.")
+
+
+@app.cli.command('expire-uploads')
+def expire_uploads_command():
+    """Delete resumable uploads that have been idle for UPLOAD_EXPIRY_HOURS."""
+    g.write_transaction = True
+    print(f"Removed {expire_uploads()} abandoned uploads.")
+
+
+@app.cli.command('compact-notifications')
+def compact_notifications():
+    """Queue deletion of notifications past their retention period (run it daily from cron)."""
+    enqueue('compact_notifications')
+    db.session.commit()
+    print("Queued notification compaction.")
+
+
+@app.cli.command('notification-digest')
+def notification_digest():
+    """Queue rolling long-unread grouped notifications into one digest per user (e.g. daily from cron)."""
+    enqueue('send_notification_digests')
+    db.session.commit()
+    print("Queued notification digests.")
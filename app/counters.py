@@ -0,0 +1,100 @@
+import atexit
+import logging
+import threading
+from collections import Counter
+from functools import wraps
+from flask import g, request
+from sqlalchemy import bindparam
+from app import db
+from app.model import Tutorial
+
+logger = logging.getLogger(__name__)
+
+
+class ViewCounter:
+    """
+    Counts tutorial page views in memory and adds them to Tutorial.view_count
+    in batches: one executemany UPDATE per flush, however often each page was
+    seen in between. A daemon thread flushes every VIEW_FLUSH_INTERVAL
+    seconds, sooner once VIEW_FLUSH_THRESHOLD views are waiting, and once
+    more at exit. Each process keeps its own buffer; the updates add up, so
+    several workers can share a database. Views still buffered when a
+    process is killed are lost.
+    """
+
+    def __init__(self):
+        self.app = None
+        self._lock = threading.Lock()
+        self._pending = Counter()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('VIEW_FLUSH_INTERVAL', 30)  # Seconds; 0 leaves flushing to flush() and exit
+        app.config.setdefault('VIEW_FLUSH_THRESHOLD', 1000)
+        app.before_request(self.start)
+        atexit.register(self.flush)
+
+    def start(self):
+        """Starts the flush thread once; cheap to call on every request."""
+        if self._thread or not self.app.config['VIEW_FLUSH_INTERVAL']:
+            return
+        with self._lock:
+            if self._thread:
+                return
+            self._thread = threading.Thread(target=self._run, name='view-counter', daemon=True)
+            self._thread.start()
+
+    def counts(self, arg):
+        """Counts a view of the tutorial named by the view argument arg, cached responses included."""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(**kwargs):
+                if request.method == 'GET':
+                    self.record(kwargs[arg])
+                return view(**kwargs)
+            return wrapper
+        return decorator
+
+    def record(self, tutorial_id):
+        with self._lock:
+            self._pending[tutorial_id] += 1
+            waiting = self._pending.total()
+        if waiting >= self.app.config['VIEW_FLUSH_THRESHOLD']:
+            self._wakeup.set()
+
+    def flush(self):
+        """Writes the buffered views. Returns how many were written."""
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+        if not pending:
+            return 0
+        table = Tutorial.__table__
+        try:
+            with self.app.app_context():
+                g.write_transaction = True
+                db.session.execute(
+                    table.update().where(table.c.id == bindparam('tutorial_id'))
+                    .values(view_count=table.c.view_count + bindparam('views')),
+                    [{'tutorial_id': tutorial_id, 'views': n} for tutorial_id, n in pending.items()]
+                )
+                db.session.commit()
+        except Exception:
+            # Keep them for the next attempt
+            with self._lock:
+                self._pending.update(pending)
+            raise
+        return pending.total()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.app.config['VIEW_FLUSH_INTERVAL'])
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Flushing tutorial view counts failed")
+
+
+view_counter = ViewCounter()
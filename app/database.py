@@ -0,0 +1,47 @@
+from flask import g, has_app_context, has_request_context, request
+from sqlalchemy import event
+
+# Applied to every new SQLite connection; override with app.config['SQLITE_PRAGMAS']
+DEFAULT_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',  # Readers no longer wait behind the writer
+    'synchronous': 'NORMAL',  # Safe with WAL; fsync at checkpoints instead of every commit
+    'cache_size': -64000,  # 64 MB page cache per connection
+    'mmap_size': 268435456,  # 256 MB memory-mapped reads
+    'temp_store': 'MEMORY',
+    'busy_timeout': 5000,  # Wait up to 5 s for the write lock instead of failing at once
+}
+
+WRITE_METHODS = {'POST', 'PUT', 'PATCH', 'DELETE'}
+
+
+def configure_engine(app, db):
+    """
+    Tunes SQLite connections for concurrent use. Other databases (e.g. a
+    Postgres SQLALCHEMY_DATABASE_URI) are left untouched.
+    """
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return
+    pragmas = app.config.get('SQLITE_PRAGMAS', DEFAULT_SQLITE_PRAGMAS)
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        # Let SQLAlchemy emit BEGIN itself (see begin_transaction below)
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    @event.listens_for(engine, 'begin')
+    def begin_transaction(conn):
+        # A deferred transaction that reads and then writes can't wait for the
+        # lock: SQLite fails it with "database is locked" straight away. Write
+        # requests (and code that sets g.write_transaction, like job workers)
+        # take the lock up front so busy_timeout can queue them.
+        if ((has_request_context() and request.method in WRITE_METHODS)
+                or (has_app_context() and g.get('write_transaction'))):
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+        else:
+            conn.exec_driver_sql("BEGIN")
@@ -0,0 +1,154 @@
+import json
+import logging
+import threading
+import traceback
+from datetime import datetime, timedelta
+from flask import g
+from sqlalchemy import and_, event, or_
+from app import db
+from app.model import Job
+
+logger = logging.getLogger(__name__)
+
+# Job kind -> handler function, filled in by the @job decorator
+HANDLERS = {}
+
+
+def job(kind):
+    """Registers a function as the handler for jobs of the given kind."""
+    def decorator(func):
+        HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+def enqueue(kind, **payload):
+    """
+    Queues a job in the current transaction. It is committed together with
+    the caller's own writes and only becomes visible to workers afterwards.
+    """
+    db.session.add(Job(kind=kind, payload=json.dumps(payload)))
+    db.session.info['jobs_enqueued'] = True
+
+
+def heartbeat():
+    """
+    Marks the running job as alive so other workers don't take it over after
+    JOB_TIMEOUT. Handlers that run longer than that call it periodically,
+    outside of their own transactions (it commits).
+    """
+    job_id = g.get('job_id')
+    if job_id is not None:
+        Job.query.filter_by(id=job_id, status='running').update({'locked_at': datetime.utcnow()})
+        db.session.commit()
+
+
+@event.listens_for(db.session, 'after_commit')
+def _wake_workers(session):
+    if session.info.pop('jobs_enqueued', False):
+        workers.wake()
+
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _discard_enqueued(session, previous_transaction):
+    if previous_transaction.parent is None:  # Ignore savepoint rollbacks
+        session.info.pop('jobs_enqueued', None)
+
+
+class WorkerPool:
+    """
+    Runs queued jobs on daemon threads inside the web process. Jobs are
+    claimed with a conditional UPDATE, so several processes (or a separate
+    `flask run-jobs` worker) can share the same table safely.
+    """
+
+    def __init__(self):
+        self.app = None
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('JOB_WORKERS', 2)  # 0 disables the in-process pool
+        app.config.setdefault('JOB_POLL_INTERVAL', 5)  # Seconds between checks when idle
+        app.config.setdefault('JOB_MAX_ATTEMPTS', 5)
+        app.config.setdefault('JOB_TIMEOUT', 300)  # Seconds before a running job is presumed dead
+        app.before_request(self.start)
+
+    def start(self):
+        """Starts the worker threads once; cheap to call on every request."""
+        if self._threads or not self.app.config['JOB_WORKERS']:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.app.config['JOB_WORKERS']):
+                thread = threading.Thread(target=self.work, name=f'job-worker-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def wake(self):
+        self._wakeup.set()
+
+    def work(self):
+        """Processes jobs until the process exits."""
+        while True:
+            try:
+                with self.app.app_context():
+                    ran = self.run_next()
+            except Exception:
+                logger.exception("Job worker loop failed")
+                ran = False
+            if not ran:
+                self._wakeup.wait(self.app.config['JOB_POLL_INTERVAL'])
+                self._wakeup.clear()
+
+    def run_next(self):
+        """Claims and runs one due job. Returns False when nothing was due."""
+        now = datetime.utcnow()
+        stale = now - timedelta(seconds=self.app.config['JOB_TIMEOUT'])
+        job = Job.query.filter(or_(
+            and_(Job.status == 'queued', Job.run_at <= now),
+            and_(Job.status == 'running', Job.locked_at < stale),
+        )).order_by(Job.run_at, Job.id).first()
+        found = job and (job.id, job.status, job.attempts)
+        # End the read-only transaction; it can't be upgraded to a write under contention
+        db.session.commit()
+        if not found:
+            return False
+
+        # From here on every transaction writes, so take the write lock up front
+        g.write_transaction = True
+        job_id, status, attempts = found
+        claimed = Job.query.filter_by(id=job_id, status=status, attempts=attempts).update(
+            {'status': 'running', 'locked_at': now, 'attempts': Job.attempts + 1},
+            synchronize_session=False
+        )
+        db.session.commit()
+        if not claimed:
+            return True  # Another worker got there first
+
+        g.job_id = job_id
+        job = Job.query.get(job_id)
+        try:
+            HANDLERS[job.kind](**json.loads(job.payload))
+            # Finished jobs are removed in the same transaction as the handler's writes
+            db.session.delete(job)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            job = Job.query.get(job.id)
+            job.last_error = traceback.format_exc()
+            if job.attempts >= self.app.config['JOB_MAX_ATTEMPTS']:
+                job.status = 'failed'
+                logger.error("Job %s (%s) failed permanently", job.id, job.kind)
+            else:
+                job.status = 'queued'
+                job.run_at = datetime.utcnow() + timedelta(seconds=2 ** job.attempts)
+            db.session.commit()
+        return True
+
+
+workers = WorkerPool()
+
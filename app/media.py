@@ -0,0 +1,173 @@
+import json
+import multiprocessing
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:  # Pillow is optional; without it products keep serving the original upload
+    Image = None
+
+# Widths generated for every product image, matched to the card grid at 1x/2x
+IMAGE_WIDTHS = (320, 640, 1024)
+# Encoder settings per output format, in order of preference for <picture>
+IMAGE_FORMATS = {
+    'avif': {'quality': 50},
+    'webp': {'quality': 80, 'method': 6},
+    'jpeg': {'quality': 82, 'optimize': True, 'progressive': True},
+}
+# HLS ladder for tutorial videos: (height, video kbps, audio kbps)
+HLS_RENDITIONS = ((360, 800, 96), (720, 2800, 128), (1080, 5000, 160))
+HLS_SEGMENT_SECONDS = 6
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def available_formats():
+    """Formats the installed Pillow can encode."""
+    if Image is None:
+        return []
+    return [fmt for fmt in IMAGE_FORMATS if fmt == 'jpeg' or features.check(fmt)]
+
+
+def generate_variants(source_path, output_dir, stem, formats):
+    """
+    Writes resized copies of source_path for every width and format and
+    returns their metadata. Re-encoding drops EXIF/GPS and other metadata.
+    Runs in a worker process, so it must only touch plain arguments.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    variants = []
+    with Image.open(source_path) as original:
+        # Apply the EXIF orientation before the metadata is thrown away
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+        # Never upscale: images narrower than a width only get their own size
+        widths = sorted({min(width, image.width) for width in IMAGE_WIDTHS})
+        for width in widths:
+            height = round(image.height * width / image.width)
+            resized = image.resize((width, height), Image.LANCZOS) if width != image.width else image
+            for fmt in formats:
+                frame = resized.convert('RGB') if fmt == 'jpeg' and resized.mode != 'RGB' else resized
+                filename = f"{stem}-{width}w.{'jpg' if fmt == 'jpeg' else fmt}"
+                frame.save(os.path.join(output_dir, filename), fmt.upper(), **IMAGE_FORMATS[fmt])
+                variants.append({'format': fmt, 'width': width, 'height': height, 'filename': filename})
+    return variants
+
+
+def process_image(source_path, output_dir, stem, max_workers=None):
+    """Generates variants in the shared process pool, keeping CPU-heavy encoding off the GIL."""
+    global _pool
+    if Image is None:
+        return []
+    with _pool_lock:
+        if _pool is None:
+            # Forking a process with running threads can copy a lock another thread holds
+            _pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('forkserver'))
+    return _pool.submit(generate_variants, source_path, output_dir, stem, available_formats()).result()
+
+
+def video_tools_available(ffmpeg, ffprobe):
+    """ffmpeg is optional too; without it tutorials keep serving the original video."""
+    return bool(shutil.which(ffmpeg) and shutil.which(ffprobe))
+
+
+def probe_video(source_path, ffprobe='ffprobe'):
+    """Returns the duration (seconds), frame height and whether there is sound, or None for files without video."""
+    result = subprocess.run(
+        [ffprobe, '-v', 'error', '-show_entries', 'format=duration:stream=codec_type,height',
+         '-of', 'json', source_path],
+        capture_output=True, text=True, check=True
+    )
+    info = json.loads(result.stdout)
+    streams = info.get('streams', [])
+    video = next((s for s in streams if s.get('codec_type') == 'video' and s.get('height')), None)
+    if video is None:
+        return None
+    return {
+        'duration': float(info.get('format', {}).get('duration') or 0),
+        'height': int(video['height']),
+        'audio': any(s.get('codec_type') == 'audio' for s in streams),
+    }
+
+
+def transcode_hls(source_path, output_dir, stem, ffmpeg='ffmpeg', ffprobe='ffprobe', heartbeat=None):
+    """
+    Encodes source_path into H.264/AAC HLS renditions for each HLS_RENDITIONS
+    height up to the source's own, with a master playlist and a poster frame,
+    all named {stem}-*. Returns their metadata, or None if there is no video
+    stream. ffmpeg runs as a child process; heartbeat() is called every 30 s
+    while it works.
+    """
+    info = probe_video(source_path, ffprobe)
+    if info is None:
+        return None
+    os.makedirs(output_dir, exist_ok=True)
+    # Never upscale: small videos get a single rendition at their own (even) height
+    ladder = [r for r in HLS_RENDITIONS if r[0] <= info['height']]
+    if not ladder:
+        ladder = [(info['height'] - info['height'] % 2,) + HLS_RENDITIONS[0][1:]]
+
+    outputs = ''.join(f'[s{i}]' for i in range(len(ladder)))
+    graph = f'[0:v]split={len(ladder)}{outputs};' + ';'.join(
+        f'[s{i}]scale=-2:{height}[v{i}]' for i, (height, _, _) in enumerate(ladder))
+    args = [ffmpeg, '-nostdin', '-y', '-v', 'error', '-i', source_path, '-filter_complex', graph]
+    stream_map = []
+    for i, (height, video_kbps, audio_kbps) in enumerate(ladder):
+        args += ['-map', f'[v{i}]', f'-c:v:{i}', 'libx264', f'-b:v:{i}', f'{video_kbps}k',
+                 f'-maxrate:v:{i}', f'{video_kbps}k', f'-bufsize:v:{i}', f'{video_kbps * 2}k']
+        if info['audio']:
+            args += ['-map', 'a:0', f'-c:a:{i}', 'aac', f'-b:a:{i}', f'{audio_kbps}k']
+            stream_map.append(f'v:{i},a:{i},name:{height}p')
+        else:
+            stream_map.append(f'v:{i},name:{height}p')
+    args += [
+        '-preset', 'veryfast', '-pix_fmt', 'yuv420p', '-ac', '2',
+        # Keyframes on segment boundaries so every rendition switches cleanly
+        '-force_key_frames', f'expr:gte(t,n_forced*{HLS_SEGMENT_SECONDS})', '-sc_threshold', '0',
+        '-f', 'hls', '-hls_time', str(HLS_SEGMENT_SECONDS), '-hls_playlist_type', 'vod',
+        '-hls_flags', 'independent_segments',
+        '-hls_segment_filename', os.path.join(output_dir, f'{stem}-%v-%05d.ts'),
+        '-master_pl_name', f'{stem}-master.m3u8',
+        '-var_stream_map', ' '.join(stream_map),
+        os.path.join(output_dir, f'{stem}-%v.m3u8'),
+    ]
+    _run(args, heartbeat)
+
+    poster = f'{stem}-poster.jpg'
+    _run([ffmpeg, '-nostdin', '-y', '-v', 'error', '-ss', str(min(1.0, info['duration'] / 2)), '-i', source_path,
+          '-frames:v', '1', '-vf', f'scale=-2:{min(720, ladder[-1][0])}', '-q:v', '3',
+          os.path.join(output_dir, poster)], heartbeat)
+    return {
+        'playlist': f'{stem}-master.m3u8',
+        'poster': poster,
+        'duration': round(info['duration'], 2),
+        'renditions': [f'{height}p' for height, _, _ in ladder],
+    }
+
+
+def _run(args, heartbeat=None):
+    # stderr goes to a file so a chatty encoder can't fill the pipe and stall
+    with tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=stderr)
+        try:
+            while True:
+                try:
+                    process.wait(timeout=30)
+                    break
+                except subprocess.TimeoutExpired:
+                    if heartbeat:
+                        heartbeat()
+        except BaseException:
+            process.kill()
+            process.wait()
+            raise
+        if process.returncode != 0:
+            stderr.seek(0)
+            raise RuntimeError(f"{args[0]} failed: {stderr.read()[-2000:].decode(errors='replace')}")
@@ -1,11 +1,22 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime
+from datetime import datetime, timedelta
+from flask import current_app
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, SubmitField
 from wtforms.validators import DataRequired, Email, EqualTo, Length
+import enum
+import json
+from collections import Counter
+from sqlalchemy import event
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.hybrid import hybrid_property
 from app import db  # Ensure db is properly initialized in __init__.py
+from app.pubsub import hub
+from app.cache import response_cache
 
 class User(db.Model, UserMixin):
     id = db.Column(db.Integer, primary_key=True)
@@ -14,6 +25,7 @@ class User(db.Model, UserMixin):
     password_hash = db.Column(db.String(256), nullable=False)
     role = db.Column(db.String(50), nullable=False)  # 'facilitator' or 'learner'
     is_admin = db.Column(db.Boolean, default=False)  # Admin flag
+    unread_notification_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Denormalized badge counter
     notifications = db.relationship('Notification', backref='user', lazy='dynamic')
 
     def set_password(self, password):
@@ -30,26 +42,57 @@ class User(db.Model, UserMixin):
 class Tutorial(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
-    category = db.Column(db.String(100), nullable=False)
+    category = db.Column(db.String(100), nullable=False, index=True)
     description = db.Column(db.Text, nullable=True)
     file_path = db.Column(db.String(300), nullable=True)  # Now optional
     youtube_link = db.Column(db.String(300), nullable=True)  # New field
-    uploaded_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)  # Foreign key to User
+    file_blob_id = db.Column(db.Integer, db.ForeignKey('blob.id'), nullable=True)  # Content-addressed upload
+    # Adaptive streaming renditions of uploaded videos, files in static/tutorials/variants
+    hls_playlist = db.Column(db.String(300), nullable=True)  # Master playlist
+    poster_filename = db.Column(db.String(300), nullable=True)
+    duration = db.Column(db.Float, nullable=True)  # Seconds
+    uploaded_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)  # Foreign key to User
     uploader = db.relationship('User', backref='tutorials')  # Relationship to User
+    # Engagement, kept current by bump_engagement() and app/counters.py instead of counted per card
+    comment_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Top-level comments
+    reply_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    view_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    last_activity_at = db.Column(db.DateTime, nullable=True)  # Newest comment or reply
 
+    @hybrid_property
+    def activity(self):
+        """Comments and replies together; the "most active" sort key."""
+        return self.comment_count + self.reply_count
 
     def __repr__(self):
         return f"<Tutorial {self.title}, Category: {self.category}, Uploaded by User ID: {self.uploaded_by}>"
 
 
+# Most active tutorials first, paged by (activity, id)
+db.Index('ix_tutorial_activity_id', Tutorial.comment_count + Tutorial.reply_count, Tutorial.id)
+
+
+def bump_engagement(tutorial_id, comments=0, replies=0):
+    """Adjusts a tutorial's comment and reply counters with a single UPDATE; additions are activity."""
+    values = {Tutorial.comment_count: Tutorial.comment_count + comments,
+              Tutorial.reply_count: Tutorial.reply_count + replies}
+    if comments > 0 or replies > 0:
+        values[Tutorial.last_activity_at] = datetime.utcnow()
+    Tutorial.query.filter_by(id=tutorial_id).update(values, synchronize_session=False)
+
+
 
 
 class Comment(db.Model):
+    __table_args__ = (
+        # Top-level comments of a tutorial, paged by id
+        db.Index('ix_comment_tutorial_id_parent_id_id', 'tutorial_id', 'parent_id', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     text = db.Column(db.Text, nullable=False)
     tutorial_id = db.Column(db.Integer, db.ForeignKey('tutorial.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    parent_id = db.Column(db.Integer, db.ForeignKey('comment.id'), nullable=True)  # For replies
+    parent_id = db.Column(db.Integer, db.ForeignKey('comment.id'), nullable=True, index=True)  # For replies
     replies = db.relationship('Comment', backref=db.backref('parent', remote_side=[id]), lazy='dynamic')
     user = db.relationship('User', backref='comments')  # Add this relationship
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
@@ -63,30 +106,217 @@ class Product(db.Model):
     name = db.Column(db.String(150), nullable=False)
     description = db.Column(db.Text, nullable=False)
     image_filename = db.Column(db.String(300), nullable=False)  # Path to the uploaded image file
+    image_variants = db.Column(db.Text, nullable=True)  # JSON list of resized copies, filled in by app/media.py
+    image_blob_id = db.Column(db.Integer, db.ForeignKey('blob.id'), nullable=True)  # Content-addressed upload
     whatsapp_link = db.Column(db.String(300), nullable=False)  # Link to contact via WhatsApp
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)  # User ID of the seller
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)  # User ID of the seller
+
+    def variants_by_format(self):
+        """Groups the resized copies by format, narrowest first, for srcset."""
+        grouped = {}
+        for variant in json.loads(self.image_variants) if self.image_variants else []:
+            grouped.setdefault(variant['format'], []).append(variant)
+        for variants in grouped.values():
+            variants.sort(key=lambda v: v['width'])
+        return grouped
 
     def __repr__(self):
         return f"<Product {self.name}, Seller ID: {self.user_id}, Image: {self.image_filename}>"
 
 
+class NotificationKind(str, enum.Enum):
+    """What a notification is about, and so which target ids it carries."""
+    MESSAGE = 'message'  # Free text
+    TUTORIAL_COMMENT = 'tutorial_comment'  # tutorial_id
+    COMMENT_REPLY = 'comment_reply'  # comment_id (the reply) and tutorial_id
+    ORDER_PLACED = 'order_placed'  # product_id and order_id, for the seller
+    ORDER_STATUS = 'order_status'  # order_id and product_id, for the buyer
+    NEW_UPLOAD = 'new_upload'  # tutorial_id or product_id, for the admin
+    DIGEST = 'digest'  # Roll-up of unread grouped notifications
+
+
 # Notification model
 class Notification(db.Model):
+    __table_args__ = (
+        # A user's notifications newest first (paged by id), and the same restricted to read/unread
+        db.Index('ix_notification_user_id_id', 'user_id', 'id'),
+        db.Index('ix_notification_user_id_is_read_timestamp', 'user_id', 'is_read', 'timestamp'),
+        db.Index('ix_notification_user_id_group_key', 'user_id', 'group_key'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     message = db.Column(db.String(256), nullable=False)
     is_read = db.Column(db.Boolean, default=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
-    comment_id = db.Column(db.Integer, nullable=True)  # For direct comment linking
+    kind = db.Column(db.Enum(NotificationKind, native_enum=False, length=30,
+                             values_callable=lambda kinds: [kind.value for kind in kinds]),
+                     nullable=False, default=NotificationKind.MESSAGE, server_default='message')
+    # Targets for links, resolved in bulk by the notifications page; they may have been deleted since
+    comment_id = db.Column(db.Integer, nullable=True)
+    tutorial_id = db.Column(db.Integer, nullable=True)
+    product_id = db.Column(db.Integer, nullable=True)
+    order_id = db.Column(db.Integer, nullable=True)
+    # Repeated events about one thing, e.g. 'tutorial_comment:7', share a row (see add_grouped_notification)
+    group_key = db.Column(db.String(100), nullable=True)
+    count = db.Column(db.Integer, nullable=False, default=1, server_default='1')  # Events folded into this row
+    actors = db.Column(db.Text, nullable=True)  # JSON list of the distinct users behind those events
+
+    def mark_read(self):
+        """Marks the notification as read and decrements the owner's unread counter."""
+        if not self.is_read:
+            self.is_read = True
+            _bump_unread_count(self.user_id, -1)
+
+    def mark_unread(self):
+        """Marks the notification as unread and increments the owner's unread counter."""
+        if self.is_read:
+            self.is_read = False
+            _bump_unread_count(self.user_id, 1)
+
+    def delete(self):
+        """Deletes the notification, keeping the owner's unread counter in step."""
+        if not self.is_read:
+            _bump_unread_count(self.user_id, -1)
+        db.session.delete(self)
+
+
+def _bump_unread_count(user_id, delta):
+    """Adjusts User.unread_notification_count in SQL so concurrent writers don't lose updates."""
+    count = db.session.execute(
+        db.update(User).where(User.id == user_id)
+        .values({User.unread_notification_count: User.unread_notification_count + delta})
+        .returning(User.unread_notification_count)
+    ).scalar()
+    # Remember the new total so it can be pushed to open streams once it commits; totals
+    # rather than deltas, so a stream that read the count just before can't count twice
+    db.session.info.setdefault('unread_counts', {})[user_id] = count
+    response_cache.invalidate(f'user:{user_id}')  # The navbar badge count is cached (see app/auth.py)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _publish_unread_counts(session):
+    for user_id, count in session.info.pop('unread_counts', {}).items():
+        hub.publish(user_id, {'count': count})
+
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _discard_unread_counts(session, previous_transaction):
+    if previous_transaction.parent is None:  # Ignore savepoint rollbacks
+        session.info.pop('unread_counts', None)
+
+
+def add_notification(user_id, message, comment_id=None, kind=NotificationKind.MESSAGE, **targets):
+    """
+    Adds an unread notification and bumps the recipient's counter in the same
+    transaction. targets are the kind's target ids, e.g. tutorial_id=7.
+    """
+    notif = Notification(user_id=user_id, message=message, kind=kind, comment_id=comment_id, is_read=False, **targets)
+    db.session.add(notif)
+    _bump_unread_count(user_id, 1)
+    return notif
+
+
+def add_grouped_notification(user_id, kind, group_id, actor, render, **targets):
+    """
+    Folds another event into the recipient's unread notification of this
+    kind about group_id (e.g. the tutorial commented on) if that saw
+    activity in the last NOTIFICATION_COALESCE_HOURS, and otherwise adds a
+    new one. actor is the username behind the event; render(count, actors)
+    returns the message for a row standing for count events by actors
+    distinct users. targets are updated to the latest event's. Folding
+    leaves the unread counter alone.
+    """
+    group_key = f'{kind.value}:{group_id}'
+    cutoff = datetime.utcnow() - timedelta(hours=current_app.config['NOTIFICATION_COALESCE_HOURS'])
+    notif = (Notification.query.filter_by(user_id=user_id, group_key=group_key, is_read=False)
+             .filter(Notification.timestamp >= cutoff).order_by(Notification.id.desc())
+             .with_for_update().first())
+    if notif is None:
+        notif = add_notification(user_id, render(1, 1), kind=kind, **targets)
+        notif.group_key = group_key
+        notif.actors = json.dumps([actor])
+        return notif
+    # Rows grouped before actors were tracked count their earlier events as someone else's
+    actors = json.loads(notif.actors) if notif.actors is not None else [None]
+    if actor not in actors:
+        actors.append(actor)
+    notif.actors = json.dumps(actors)
+    notif.count += 1
+    notif.message = render(notif.count, len(actors))
+    notif.timestamp = datetime.utcnow()
+    for name, value in targets.items():
+        setattr(notif, name, value)
+    return notif
+
+
+def mark_notifications_read(user_id, *criteria):
+    """
+    Marks a user's unread notifications (all, or those matching criteria) as
+    read in one UPDATE and lowers their counter by the rows it changed.
+    Returns that number.
+    """
+    updated = Notification.query.filter_by(user_id=user_id, is_read=False).filter(*criteria).update(
+        {Notification.is_read: True}, synchronize_session=False
+    )
+    if updated:
+        _bump_unread_count(user_id, -updated)
+    return updated
+
+
+def delete_notifications(*criteria):
+    """
+    Deletes the notifications matching criteria in one DELETE and lowers the
+    unread counters of their owners by the unread rows it removed. Returns
+    the number deleted.
+    """
+    rows = db.session.execute(
+        db.delete(Notification).where(*criteria).returning(Notification.user_id, Notification.is_read),
+        execution_options={'synchronize_session': False}
+    ).all()
+    for user_id, unread in Counter(user_id for user_id, is_read in rows if not is_read).items():
+        _bump_unread_count(user_id, -unread)
+    return len(rows)
+
+class OrderStatus(str, enum.Enum):
+    PENDING = 'pending'
+    ACCEPTED = 'accepted'
+    REJECTED = 'rejected'
+
+
+# The only moves transition_orders() makes; accepted and rejected are final
+ORDER_TRANSITIONS = {
+    OrderStatus.PENDING: {OrderStatus.ACCEPTED, OrderStatus.REJECTED},
+}
+
+
+def can_transition(current, status):
+    return OrderStatus(status) in ORDER_TRANSITIONS.get(OrderStatus(current), ())
+
+
+def _order_status_column(**kwargs):
+    return db.Column(db.Enum(OrderStatus, native_enum=False, length=20,
+                             values_callable=lambda statuses: [status.value for status in statuses]), **kwargs)
+
 
 # Order model
 class Order(db.Model):
+    __table_args__ = (
+        # Seller inbox newest first (ids grow with time), all orders or one status
+        db.Index('ix_order_seller_id_id', 'seller_id', 'id'),
+        db.Index('ix_order_seller_id_status_id', 'seller_id', 'status', 'id'),
+        # At most one pending order per buyer and product; place_order inserts against it
+        db.Index('uq_order_pending_product_id_buyer_id', 'product_id', 'buyer_id', unique=True,
+                 sqlite_where=db.text("status = 'pending'"), postgresql_where=db.text("status = 'pending'")),
+        # A retried POST carrying the same key finds the order it already created
+        db.Index('uq_order_buyer_id_idempotency_key', 'buyer_id', 'idempotency_key', unique=True),
+    )
     id = db.Column(db.Integer, primary_key=True)
     product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
     buyer_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     seller_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    status = db.Column(db.String(20), default='pending')  # pending, accepted, rejected
+    status = _order_status_column(default=OrderStatus.PENDING)  # Changed only by transition_orders()
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    idempotency_key = db.Column(db.String(64), nullable=True)  # Client-supplied, see insert_order()
 
     product = db.relationship('Product', backref='orders')
     buyer = db.relationship('User', foreign_keys=[buyer_id], backref='orders_placed')
@@ -94,3 +324,206 @@ class Order(db.Model):
 
     def __repr__(self):
         return f"<Order {self.id} - Product {self.product_id} - Buyer {self.buyer_id} - Seller {self.seller_id} - Status {self.status}>"
+
+
+# Append-only history of every order's statuses; rows are never updated
+class OrderEvent(db.Model):
+    __table_args__ = (
+        db.Index('ix_order_event_order_id_id', 'order_id', 'id'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False)
+    from_status = _order_status_column(nullable=True)  # None when the order was placed
+    to_status = _order_status_column(nullable=False)
+    actor_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)  # Who made the change
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class OrderCounts:
+    """Order counts by status, kept current on every transition instead of counted from Order."""
+    pending = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    accepted = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rejected = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    @property
+    def total(self):
+        return self.pending + self.accepted + self.rejected
+
+    @property
+    def acceptance_rate(self):
+        """Share of answered orders that were accepted, or None before the first answer."""
+        answered = self.accepted + self.rejected
+        return self.accepted / answered if answered else None
+
+
+class SellerOrderStats(OrderCounts, db.Model):
+    seller_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+
+
+class ProductOrderStats(OrderCounts, db.Model):
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), primary_key=True)
+
+
+def _insert_for_dialect():
+    """The dialect's INSERT with ON CONFLICT clauses (SQLite, PostgreSQL), or None."""
+    return {'sqlite': sqlite_insert, 'postgresql': postgresql_insert}.get(db.engine.dialect.name)
+
+
+def _count_new_order(model, key_column, key):
+    """Adds a pending order to a stats row, creating the row for the first order."""
+    insert = _insert_for_dialect()
+    if insert is not None:
+        db.session.execute(insert(model).values({key_column.key: key, 'pending': 1})
+                           .on_conflict_do_update(index_elements=[key_column], set_={'pending': model.pending + 1}))
+    elif not db.session.execute(db.update(model).where(key_column == key).values(pending=model.pending + 1)).rowcount:
+        db.session.add(model(**{key_column.key: key, 'pending': 1}))
+
+
+def insert_order(product_id, buyer_id, seller_id, idempotency_key=None):
+    """
+    Inserts a pending order in one statement, unless the buyer already has a
+    pending order for the product or one with the same idempotency key; the
+    unique indexes on Order decide, so concurrent requests cannot both win.
+    The placement is recorded as the order's first event and counted in the
+    seller's and product's stats. Returns the new order's id, or None when
+    nothing was inserted.
+    """
+    now = datetime.utcnow()
+    values = dict(product_id=product_id, buyer_id=buyer_id, seller_id=seller_id, status=OrderStatus.PENDING,
+                  timestamp=now, idempotency_key=idempotency_key)
+    insert = _insert_for_dialect()
+    if insert is not None:
+        stmt = insert(Order).values(**values).on_conflict_do_nothing().returning(Order.id)
+        order_id = db.session.execute(stmt).scalar()
+    else:
+        try:
+            with db.session.begin_nested():
+                order = Order(**values)
+                db.session.add(order)
+            order_id = order.id
+        except IntegrityError:
+            order_id = None
+    if order_id is not None:
+        db.session.add(OrderEvent(order_id=order_id, to_status=OrderStatus.PENDING, actor_id=buyer_id, timestamp=now))
+        _count_new_order(SellerOrderStats, SellerOrderStats.seller_id, seller_id)
+        _count_new_order(ProductOrderStats, ProductOrderStats.product_id, product_id)
+    return order_id
+
+
+def transition_orders(status, actor_id, *criteria):
+    """
+    Moves the orders matching criteria to status, skipping any whose current
+    status doesn't allow it (see ORDER_TRANSITIONS). Each source status takes
+    one UPDATE ... RETURNING; the changes are appended to OrderEvent and the
+    stats rows adjusted by the per-seller and per-product differences.
+    Returns the ids of the orders that changed.
+    """
+    status = OrderStatus(status)
+    sources = [source for source, targets in ORDER_TRANSITIONS.items() if status in targets]
+    if not sources:
+        raise ValueError(f"No order can move to {status.value!r}")
+    now = datetime.utcnow()
+    changed, events = [], []
+    sellers, products = Counter(), Counter()
+    for source in sources:
+        rows = db.session.execute(
+            db.update(Order).where(Order.status == source, *criteria).values(status=status)
+            .returning(Order.id, Order.seller_id, Order.product_id)
+        ).all()
+        for order_id, seller_id, product_id in rows:
+            changed.append(order_id)
+            events.append({'order_id': order_id, 'from_status': source, 'to_status': status,
+                           'actor_id': actor_id, 'timestamp': now})
+            sellers[seller_id, source] += 1
+            products[product_id, source] += 1
+    if events:
+        db.session.execute(db.insert(OrderEvent), events)
+    for model, key_column, counts in ((SellerOrderStats, SellerOrderStats.seller_id, sellers),
+                                      (ProductOrderStats, ProductOrderStats.product_id, products)):
+        for (key, source), n in counts.items():
+            from_column, to_column = getattr(model, source.value), getattr(model, status.value)
+            db.session.execute(db.update(model).where(key_column == key)
+                               .values({from_column: from_column - n, to_column: to_column + n}))
+    return changed
+
+
+def delete_product_orders(product_id):
+    """
+    Deletes every order for a product together with its events and the
+    product's stats row, taking the orders back out of their sellers' stats.
+    Call it before deleting the product itself. Returns the number of orders
+    deleted.
+    """
+    order_ids = db.select(Order.id).where(Order.product_id == product_id).scalar_subquery()
+    db.session.execute(db.delete(OrderEvent).where(OrderEvent.order_id.in_(order_ids)),
+                       execution_options={'synchronize_session': False})
+    rows = db.session.execute(
+        db.delete(Order).where(Order.product_id == product_id).returning(Order.seller_id, Order.status),
+        execution_options={'synchronize_session': False}
+    ).all()
+    for (seller_id, status), n in Counter(rows).items():
+        column = getattr(SellerOrderStats, OrderStatus(status).value)
+        db.session.execute(db.update(SellerOrderStats).where(SellerOrderStats.seller_id == seller_id)
+                           .values({column: column - n}))
+    db.session.execute(db.delete(ProductOrderStats).where(ProductOrderStats.product_id == product_id))
+    return len(rows)
+
+
+# Background job queue (see app/jobs.py)
+class Job(db.Model):
+    __table_args__ = (
+        db.Index('ix_job_status_run_at', 'status', 'run_at'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)  # Name of the registered handler
+    payload = db.Column(db.Text, nullable=False, default='{}')  # JSON keyword arguments
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<Job {self.id} {self.kind} - Status {self.status} - Attempts {self.attempts}>"
+
+
+# Content-addressed upload storage (see app/storage.py)
+class Blob(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    path = db.Column(db.String(300), nullable=False, unique=True)  # Relative to static/, e.g. images/<sha256>.jpg
+    sha256 = db.Column(db.String(64), nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)  # Products/tutorials using this file
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @property
+    def filename(self):
+        return self.path.rsplit('/', 1)[-1]
+
+    def __repr__(self):
+        return f"<Blob {self.path} - Size {self.size} - Refs {self.ref_count}>"
+
+
+# Resumable tutorial video uploads in progress (see app/uploads.py)
+class Upload(db.Model):
+    id = db.Column(db.String(32), primary_key=True)  # Random hex token, part of the upload URL
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    filename = db.Column(db.String(200), nullable=False)  # Original (sanitised) name of the video
+    length = db.Column(db.BigInteger, nullable=False)  # Total size announced by the client
+    offset = db.Column(db.BigInteger, nullable=False, default=0)  # Bytes received so far
+    status = db.Column(db.String(20), nullable=False, default='uploading')  # uploading, assembling
+    # Tutorial details, used once the file is complete
+    title = db.Column(db.String(200), nullable=False)
+    category = db.Column(db.String(100), nullable=False)
+    description = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    user = db.relationship('User')
+
+    @property
+    def extension(self):
+        return self.filename.rsplit('.', 1)[-1].lower() if '.' in self.filename else ''
+
+    def __repr__(self):
+        return f"<Upload {self.id} - {self.offset}/{self.length} bytes - Status {self.status}>"
@@ -0,0 +1,38 @@
+from sqlalchemy import tuple_
+
+
+def keyset_page(query, column, after=None, per_page=24, descending=True, tiebreak=None):
+    """
+    Returns (items, next_cursor) for one page of query ordered by column.
+    Rows are located with `column < after` (or `>` when ascending) instead of
+    OFFSET, so every page costs the same index range scan no matter how deep
+    the client has scrolled. One extra row is fetched to tell whether another
+    page exists without a COUNT.
+
+    A column whose values repeat (e.g. a count) needs a unique tiebreak
+    column as well; after and the cursor are then (value, tiebreak) pairs,
+    written as 'value:tiebreak' in URLs (see parse_cursor).
+    """
+    keys = (column, tiebreak) if tiebreak is not None else (column,)
+    if after is not None and tiebreak is not None:
+        # The plain bound on column lets the planner seek into the index; the row comparison is exact
+        query = query.filter(column <= after[0] if descending else column >= after[0],
+                             tuple_(*keys) < after if descending else tuple_(*keys) > after)
+    elif after is not None:
+        query = query.filter(column < after if descending else column > after)
+    rows = query.order_by(*(key.desc() if descending else key.asc() for key in keys)).limit(per_page + 1).all()
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        if tiebreak is not None:
+            return rows, ':'.join(str(getattr(rows[-1], key.key)) for key in keys)
+        return rows, getattr(rows[-1], column.key)
+    return rows, None
+
+
+def parse_cursor(value):
+    """Reads a 'value:tiebreak' cursor of integers back into a pair, or None if it isn't one."""
+    try:
+        first, second = value.split(':')
+        return int(first), int(second)
+    except (AttributeError, ValueError):
+        return None
@@ -0,0 +1,66 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class HashingBusy(Exception):
+    """Every hashing slot in this process is taken; answer 503 and let the client retry."""
+
+
+class PasswordHasher:
+    """
+    Hashes and checks passwords in a small process pool, so the deliberately
+    slow key derivation neither holds the GIL nor ties up request threads
+    beyond their own wait. At most PASSWORD_HASH_QUEUE hashes may be running
+    or waiting per process; past that, calls fail at once with HashingBusy
+    instead of queueing behind a credential-stuffing burst.
+    """
+
+    def __init__(self):
+        self.app = None
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._slots = None
+        self._method_prefix = None
+
+    def init_app(self, app):
+        self.app = app
+        # Werkzeug method string for new hashes; older hashes are upgraded on login
+        app.config.setdefault('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+        app.config.setdefault('PASSWORD_HASH_WORKERS', 2)  # 0 hashes on the request thread
+        app.config.setdefault('PASSWORD_HASH_QUEUE', 8)
+        self._slots = threading.BoundedSemaphore(app.config['PASSWORD_HASH_QUEUE'])
+        # Werkzeug fills in defaults (e.g. 'scrypt' -> 'scrypt:32768:8:1'); hash once at startup to see them
+        sample = generate_password_hash('', app.config['PASSWORD_HASH_METHOD'])
+        self._method_prefix = sample.split('$', 1)[0]
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.app.config['PASSWORD_HASH_METHOD'])
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """Whether password_hash was made with other parameters than PASSWORD_HASH_METHOD."""
+        return password_hash.split('$', 1)[0] != self._method_prefix
+
+    def _run(self, function, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusy()
+        try:
+            workers = self.app.config['PASSWORD_HASH_WORKERS']
+            if not workers:
+                return function(*args)
+            with self._pool_lock:
+                if self._pool is None:
+                    # Not fork: the web process has threads that may hold locks at that moment
+                    self._pool = ProcessPoolExecutor(max_workers=min(workers, os.cpu_count() or 1),
+                                                     mp_context=multiprocessing.get_context('forkserver'))
+            return self._pool.submit(function, *args).result()
+        finally:
+            self._slots.release()
+
+
+hasher = PasswordHasher()
@@ -0,0 +1,196 @@
+import hmac
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from flask import abort, before_render_template, current_app, g, has_request_context, request, template_rendered
+from flask_login import current_user
+from sqlalchemy import event
+from app.cache import response_cache
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the request duration histogram
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Profiler:
+    """
+    Opt-in request instrumentation (PROFILING=1). For every endpoint it
+    records wall time, template render time, SQL statement count and time,
+    and statements repeated within one request (likely N+1 queries). Totals
+    are served in Prometheus text format at /metrics, to admins and to
+    scrapers sending METRICS_TOKEN as a bearer token, and admins can take a
+    sampling profile of the running process at /metrics/profile.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = Counter()
+        self.durations = defaultdict(lambda: [0] * (len(DURATION_BUCKETS) + 1))
+        self.seconds = defaultdict(Counter)  # endpoint -> {'wall', 'template', 'sql'}
+        self.queries = Counter()
+        self.repeated = Counter()
+        self.repeated_statements = {}  # (endpoint, statement) -> most executions seen in one request
+        self._endpoints = {}  # thread id -> endpoint it is serving, for the sampler
+
+    def init_app(self, app, db):
+        app.config.setdefault('PROFILING_REPEAT_THRESHOLD', 5)  # Same statement this often in one request = N+1
+        if not app.config.get('PROFILING'):
+            return
+        app.before_request(self._start_request)
+        app.teardown_request(self._finish_request)
+        before_render_template.connect(self._start_render, app)
+        template_rendered.connect(self._finish_render, app)
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', self._start_query)
+        event.listen(engine, 'after_cursor_execute', self._finish_query)
+        app.add_url_rule('/metrics', 'metrics', self.metrics_view)
+        app.add_url_rule('/metrics/profile', 'metrics_profile', self.profile_view)
+
+    # Per-request bookkeeping lives on flask.g
+
+    def _start_request(self):
+        g.profile = {'start': time.perf_counter(), 'sql': 0.0, 'template': 0.0, 'depth': 0,
+                     'statements': Counter()}
+        self._endpoints[threading.get_ident()] = request.endpoint or 'unknown'
+
+    def _finish_request(self, exc=None):
+        profile = g.pop('profile', None)
+        self._endpoints.pop(threading.get_ident(), None)
+        if profile is None:
+            return
+        endpoint = request.endpoint or 'unknown'
+        wall = time.perf_counter() - profile['start']
+        statements = profile['statements']
+        threshold = current_app.config['PROFILING_REPEAT_THRESHOLD']
+        repeated = {sql: n for sql, n in statements.items() if n >= threshold}
+        with self._lock:
+            self.requests[endpoint] += 1
+            buckets = self.durations[endpoint]
+            buckets[next((i for i, bound in enumerate(DURATION_BUCKETS) if wall <= bound), len(DURATION_BUCKETS))] += 1
+            seconds = self.seconds[endpoint]
+            seconds['wall'] += wall
+            seconds['template'] += profile['template']
+            seconds['sql'] += profile['sql']
+            self.queries[endpoint] += sum(statements.values())
+            for sql, n in repeated.items():
+                self.repeated[endpoint] += 1
+                key = (endpoint, sql)
+                self.repeated_statements[key] = max(n, self.repeated_statements.get(key, 0))
+        for sql, n in repeated.items():
+            logger.warning("%s ran the same statement %d times (possible N+1): %s", endpoint, n, sql)
+
+    def _start_render(self, sender, template, context, **extra):
+        profile = g.get('profile') if has_request_context() else None
+        if profile is not None:
+            # Only time the outermost render; includes are part of it
+            if profile['depth'] == 0:
+                profile['render_start'] = time.perf_counter()
+            profile['depth'] += 1
+
+    def _finish_render(self, sender, template, context, **extra):
+        profile = g.get('profile') if has_request_context() else None
+        if profile is not None and profile['depth'] > 0:
+            profile['depth'] -= 1
+            if profile['depth'] == 0:
+                profile['template'] += time.perf_counter() - profile['render_start']
+
+    def _start_query(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    def _finish_query(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_start'].pop()
+        profile = g.get('profile') if has_request_context() else None
+        if profile is not None:
+            profile['sql'] += elapsed
+            # Parameters are bound separately, so the text is the same for every id in a loop
+            profile['statements'][' '.join(statement.split())] += 1
+
+    # Endpoints
+
+    def metrics_view(self):
+        token = current_app.config.get('METRICS_TOKEN')
+        sent = request.headers.get('Authorization', '').removeprefix('Bearer ')
+        if not (token and hmac.compare_digest(sent.encode(), token.encode())
+                or current_user.is_authenticated and current_user.is_admin):
+            abort(403)
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                label_text = ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+                lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+        with self._lock:
+            lines.append("# HELP http_request_duration_seconds Wall time per request.")
+            lines.append("# TYPE http_request_duration_seconds histogram")
+            for endpoint, buckets in sorted(self.durations.items()):
+                cumulative = 0
+                for bound, count in zip(DURATION_BUCKETS + ('+Inf',), buckets):
+                    cumulative += count
+                    lines.append(f'http_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}} {cumulative}')
+                lines.append(f'http_request_duration_seconds_sum{{endpoint="{endpoint}"}} {round(self.seconds[endpoint]["wall"], 6)}')
+                lines.append(f'http_request_duration_seconds_count{{endpoint="{endpoint}"}} {self.requests[endpoint]}')
+            for part in ('template', 'sql'):
+                metric(f'http_request_{part}_seconds_total', 'counter', f'Time spent ({part}).',
+                       [({'endpoint': e}, round(s[part], 6)) for e, s in sorted(self.seconds.items())])
+            metric('sql_queries_total', 'counter', 'SQL statements executed.',
+                   [({'endpoint': e}, n) for e, n in sorted(self.queries.items())])
+            metric('sql_repeated_statements_total', 'counter',
+                   'Statements run at least PROFILING_REPEAT_THRESHOLD times in one request (possible N+1).',
+                   [({'endpoint': e}, n) for e, n in sorted(self.repeated.items())])
+            metric('sql_repeated_statement_max', 'gauge', 'Most executions of one statement in a single request.',
+                   [({'endpoint': e, 'statement': sql[:200]}, n)
+                    for (e, sql), n in sorted(self.repeated_statements.items())])
+        stats = response_cache.stats()
+        metric('cache_requests_total', 'counter', 'Response cache lookups.',
+               [({'name': name, 'result': result}, counts[key])
+                for name, counts in stats['by_name'].items() for result, key in (('hit', 'hits'), ('miss', 'misses'))])
+        return '\n'.join(lines) + '\n', 200, {'Content-Type': 'text/plain; version=0.0.4'}
+
+    def profile_view(self):
+        """
+        Samples every thread's stack for ?seconds= (default 10) at ?interval=
+        (default 5 ms) and returns the counts as folded stacks, rooted at the
+        endpoint each thread was serving; feed them to flamegraph.pl or
+        speedscope.
+        """
+        if not (current_user.is_authenticated and current_user.is_admin):
+            abort(403)
+        duration = min(request.args.get('seconds', 10, type=float), 60)
+        interval = request.args.get('interval', 0.005, type=float)
+        return '\n'.join(f"{stack} {n}" for stack, n in self.sample(duration, interval).most_common()) + '\n', \
+            200, {'Content-Type': 'text/plain'}
+
+    def sample(self, duration, interval):
+        me = threading.get_ident()
+        samples = Counter()
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                # Request threads are labelled with their endpoint, others (job workers) by name
+                root = self._endpoints.get(thread_id) or names.get(thread_id, 'thread')
+                samples[';'.join([root] + stack[::-1])] += 1
+            time.sleep(interval)
+        return samples
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+
+profiler = Profiler()
@@ -0,0 +1,93 @@
+import json
+import queue
+import threading
+from collections import defaultdict
+
+
+class LocalBackend:
+    """Delivers messages inside the current process only (single worker / dev server)."""
+
+    def start(self, deliver):
+        self._deliver = deliver
+
+    def publish(self, user_id, payload):
+        self._deliver(user_id, payload)
+
+
+class RedisBackend:
+    """Relays messages through a Redis channel so every worker sees every publish."""
+
+    def __init__(self, url, channel='notifications'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("The 'redis' package is required for a redis:// NOTIFICATION_PUBSUB_URL.")
+        self._redis = redis.Redis.from_url(url)
+        self._channel = channel
+
+    def start(self, deliver):
+        def listen():
+            pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(self._channel)
+            for message in pubsub.listen():
+                data = json.loads(message['data'])
+                deliver(data['user_id'], data['payload'])
+
+        threading.Thread(target=listen, name='notification-pubsub', daemon=True).start()
+
+    def publish(self, user_id, payload):
+        self._redis.publish(self._channel, json.dumps({'user_id': user_id, 'payload': payload}))
+
+
+class NotificationHub:
+    """
+    Fans notification events out to the streaming connections of each user.
+    Every subscriber gets its own queue; the backend decides how publishes
+    reach the process that holds the connection.
+    """
+
+    def __init__(self, backend=None):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+        self._backend = None
+        self.set_backend(backend or LocalBackend())
+
+    def init_app(self, app):
+        url = app.config.get('NOTIFICATION_PUBSUB_URL')
+        if url and url.startswith('redis://'):
+            self.set_backend(RedisBackend(url))
+
+    def set_backend(self, backend):
+        backend.start(self._deliver)
+        self._backend = backend
+
+    def subscribe(self, user_id):
+        """Returns a queue that receives every payload published for user_id."""
+        q = queue.Queue(maxsize=100)
+        with self._lock:
+            self._subscribers[user_id].add(q)
+        return q
+
+    def unsubscribe(self, user_id, q):
+        with self._lock:
+            subscribers = self._subscribers.get(user_id)
+            if subscribers:
+                subscribers.discard(q)
+                if not subscribers:
+                    del self._subscribers[user_id]
+
+    def publish(self, user_id, payload):
+        self._backend.publish(user_id, payload)
+
+    def _deliver(self, user_id, payload):
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for q in subscribers:
+            try:
+                q.put_nowait(payload)
+            except queue.Full:
+                # A stalled client shouldn't block publishers; it resyncs on reconnect
+                pass
+
+
+hub = NotificationHub()
@@ -0,0 +1,79 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenBuckets:
+    """
+    In-memory token buckets, one per key: a key may spend up to burst tokens
+    at once, refilled at per_minute a minute. A bucket that has filled up
+    again is the same as no bucket, so only keys that spent recently take
+    memory, and past max_keys the least recently used are forgotten. Buckets
+    are per process, like the upload stream slots.
+    """
+
+    def __init__(self, burst, per_minute, max_keys=100000):
+        self.burst = burst
+        self.rate = per_minute / 60.0
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()  # key -> (tokens, updated_at)
+
+    def _level(self, key, now):
+        tokens, updated_at = self._buckets.get(key, (self.burst, now))
+        return min(self.burst, tokens + (now - updated_at) * self.rate)
+
+    def wait(self, key):
+        """Seconds until key can spend a token; 0 if it can now."""
+        with self._lock:
+            tokens = self._level(key, time.monotonic())
+        return 0 if tokens >= 1 else (1 - tokens) / self.rate
+
+    def take(self, key):
+        """Spends a token if key has one. Returns 0 if it did, else the seconds to wait."""
+        now = time.monotonic()
+        with self._lock:
+            tokens = self._level(key, now)
+            if tokens < 1:
+                return (1 - tokens) / self.rate
+            self._buckets[key] = (tokens - 1, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return 0
+
+
+class LoginThrottle:
+    """
+    Limits login attempts per client IP (every attempt) and per account and
+    IP (failed attempts only). Failures only count against the address they
+    came from, so guessing at an account from elsewhere never locks out its
+    owner. Both are checked before the password is hashed, so refused
+    attempts cost no CPU.
+    """
+
+    def __init__(self):
+        self.by_ip = None
+        self.by_account = None
+
+    def init_app(self, app):
+        app.config.setdefault('LOGIN_IP_BURST', 20)
+        app.config.setdefault('LOGIN_IP_PER_MINUTE', 10)
+        app.config.setdefault('LOGIN_ACCOUNT_BURST', 5)
+        app.config.setdefault('LOGIN_ACCOUNT_PER_MINUTE', 1)
+        self.by_ip = TokenBuckets(app.config['LOGIN_IP_BURST'], app.config['LOGIN_IP_PER_MINUTE'])
+        self.by_account = TokenBuckets(app.config['LOGIN_ACCOUNT_BURST'], app.config['LOGIN_ACCOUNT_PER_MINUTE'])
+
+    def attempt(self, ip, account):
+        """
+        Charges ip for an attempt on account. Returns 0 if it may go ahead,
+        else the seconds to wait. ip must be the client's own address: behind
+        a proxy, set TRUSTED_PROXIES or every client shares the proxy's bucket.
+        """
+        return self.by_ip.take(ip) or self.by_account.wait((account.lower(), ip))
+
+    def failed(self, ip, account):
+        self.by_account.take((account.lower(), ip))
+
+
+login_throttle = LoginThrottle()
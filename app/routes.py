@@ -1,18 +1,42 @@
 from app import app
-from flask import render_template, redirect, url_for, flash, request, g
+from flask import render_template, redirect, url_for, flash, request, g, jsonify
 from flask_login import login_required, current_user, logout_user, login_user
-from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
 import os
 from app import db
-from app.model import  User, Product, Tutorial, Comment, Order, Notification
+from app.model import  User, Product, Tutorial, Comment, Order, OrderStatus, Notification, Upload
+from app.model import SellerOrderStats, ProductOrderStats
+from app.model import mark_notifications_read, delete_notifications, insert_order, transition_orders, can_transition
+from app.model import delete_product_orders
+from app.model import bump_engagement
 from .forms import RegistrationForm, ProductForm, TutorialForm, LoginForm
 from flask import abort
+from sqlalchemy.orm import joinedload
+from app.pagination import keyset_page, parse_cursor
+from app.counters import view_counter
+from app.passwords import hasher, HashingBusy
+from app.ratelimit import login_throttle
+from app.jobs import enqueue
+from app.storage import store_upload, release_blob, remove_after_commit, derived_files
+from app import uploads
+from app.search import SEARCHABLE, search as run_search
+from app.cache import response_cache
+from app.auth import invalidate_user
+from app.pubsub import hub
+from flask import Response, stream_with_context
+from markupsafe import Markup
+import json
+import math
+import queue
+import time
+import uuid
+from datetime import datetime, timedelta
 
 
 
 
 @app.route('/')
+@response_cache.cached()
 def home():
     return render_template('home.html')
 
@@ -25,9 +49,13 @@ def register():
         if existing_user:
             flash('Username or email already exists. Please choose a different one.', 'danger')
             return redirect(url_for('register'))
+        db.session.commit()  # Don't hold the write lock while hashing
 
         # Create a new user
-        hashed_password = generate_password_hash(form.password.data)
+        try:
+            hashed_password = hasher.hash(form.password.data)
+        except HashingBusy:
+            return _hashing_busy('register.html', form)
         new_user = User(
             username=form.username.data,
             email=form.email.data,
@@ -46,17 +74,42 @@ def register():
 def login():
     form = LoginForm()
     if form.validate_on_submit():
+        # Refuse floods before spending any CPU on them
+        wait = login_throttle.attempt(request.remote_addr, form.email.data)
+        if wait:
+            flash('Too many login attempts. Please wait a moment and try again.', 'danger')
+            return render_template('login.html', form=form), 429, {'Retry-After': str(math.ceil(wait))}
         # Check if the user exists
         user = User.query.filter_by(email=form.email.data).first()
-        if user and check_password_hash(user.password_hash, form.password.data):
+        password_hash = user.password_hash if user else None
+        # Don't hold the write lock while the hash is checked
+        db.session.commit()
+        try:
+            valid = user is not None and hasher.verify(password_hash, form.password.data)
+        except HashingBusy:
+            return _hashing_busy('login.html', form)
+        if valid and hasher.needs_rehash(password_hash):
+            # Upgrade to the current PASSWORD_HASH_METHOD while we have the password; a
+            # busy pool just leaves it for a later login
+            try:
+                user.password_hash = hasher.hash(form.password.data)
+                db.session.commit()
+            except HashingBusy:
+                pass
+        if valid:
             # Log in the user
             login_user(user)
             flash('You have successfully logged in!', 'success')
             next_page = request.args.get('next')
             return redirect(next_page) if next_page else redirect(url_for('dashboard'))
         else:
+            login_throttle.failed(request.remote_addr, form.email.data)
             flash('Invalid email or password. Please try again.', 'danger')
     return render_template('login.html', form=form)
+
+def _hashing_busy(template, form):
+    flash('We are very busy right now. Please try again in a moment.', 'warning')
+    return render_template(template, form=form), 503, {'Retry-After': '1'}
 from werkzeug.utils import secure_filename
 import os
 
@@ -67,37 +120,28 @@ def upload_product():
     if form.validate_on_submit():
         image_file = form.image.data
         if image_file:
-            # Save to root/static/images, not app/static/images
-            # Get the absolute path to the project root
-            project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-            root_static = os.path.join(project_root, 'static', 'images')
-            if not os.path.exists(root_static):
-                os.makedirs(root_static)
-
-            filename = secure_filename(image_file.filename)
-            image_path = os.path.join(root_static, filename)
-            image_file.save(image_path)
+            # Stored in STORAGE_ROOT/images under its content hash
+            blob = store_upload(image_file, 'images')
 
             new_product = Product(
                 name=form.name.data,
                 description=form.description.data,
-                image_filename=filename,
+                image_filename=blob.filename,
+                image_blob_id=blob.id,
                 whatsapp_link=form.whatsapp_link.data,
                 user_id=current_user.id
             )
             db.session.add(new_product)
-            db.session.commit()
+            db.session.flush()  # Assigns new_product.id for the job below
+            # Resized/WebP/AVIF copies are generated off the request
+            enqueue('process_product_image', product_id=new_product.id)
+            response_cache.invalidate('products')
+            invalidate_user(current_user.id)  # Shows "My Orders" for a first product
             # Notify admin (if not uploader)
             if not current_user.is_admin:
-                from app.model import User, Notification
-                admin = User.query.filter_by(is_admin=True).first()
-                if admin:
-                    notif = Notification(
-                        user_id=admin.id,
-                        message=f"{current_user.username} uploaded a new product: '{form.name.data}'."
-                    )
-                    db.session.add(notif)
-                    db.session.commit()
+                enqueue('notify_admin', message=f"{current_user.username} uploaded a new product: '{form.name.data}'.",
+                        product_id=new_product.id)
+            db.session.commit()
             flash("Product uploaded successfully!", "success")
             return redirect(url_for('view_products'))
     return render_template('upload_product.html', form=form)
@@ -113,7 +157,6 @@ def upload_tutorial():
 
     form = TutorialForm()
     if request.method == 'POST':
-        filename = None
         youtube_link = form.youtube_link.data.strip() if form.youtube_link.data else None
         pdf_file = request.files.get('file')
         video_file = request.files.get('video_file')
@@ -126,55 +169,153 @@ def upload_tutorial():
         if sum([bool(pdf_uploaded), bool(video_uploaded), bool(link_provided)]) != 1:
             flash('Please upload only one: a PDF file, a video file, or provide a YouTube link.', 'danger')
             return render_template('upload_tutorial.html', form=form)
+        blob = None
         if pdf_uploaded:
             ext = pdf_file.filename.rsplit('.', 1)[-1].lower()
             if ext != allowed_pdf_ext:
                 flash('Invalid file type. Please upload a PDF file.', 'danger')
                 return render_template('upload_tutorial.html', form=form)
-            filename = secure_filename(pdf_file.filename)
-            project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-            root_tutorials = os.path.join(project_root, 'static', 'tutorials')
-            if not os.path.exists(root_tutorials):
-                os.makedirs(root_tutorials)
-            file_path = os.path.join(root_tutorials, filename)
-            pdf_file.save(file_path)
+            blob = store_upload(pdf_file, 'tutorials')
         elif video_uploaded:
             ext = video_file.filename.rsplit('.', 1)[-1].lower()
             if ext not in allowed_video_exts:
                 flash('Invalid file type. Please upload a supported video file (mp4, avi, mov, wmv, flv, mkv, webm).', 'danger')
                 return render_template('upload_tutorial.html', form=form)
-            filename = secure_filename(video_file.filename)
-            project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-            root_tutorials = os.path.join(project_root, 'static', 'tutorials')
-            if not os.path.exists(root_tutorials):
-                os.makedirs(root_tutorials)
-            file_path = os.path.join(root_tutorials, filename)
-            video_file.save(file_path)
+            blob = store_upload(video_file, 'tutorials')
         # Create a new tutorial
         new_tutorial = Tutorial(
             title=form.title.data,
             category=form.category.data,
             description=form.description.data,
-            file_path=filename if (pdf_uploaded or video_uploaded) else None,
+            file_path=blob.filename if blob else None,
+            file_blob_id=blob.id if blob else None,
             youtube_link=youtube_link if link_provided else None,
             uploaded_by=current_user.id
         )
         db.session.add(new_tutorial)
-        db.session.commit()
+        db.session.flush()  # Assigns new_tutorial.id for the jobs
+        if video_uploaded:
+            enqueue('transcode_tutorial_video', tutorial_id=new_tutorial.id)
+        response_cache.invalidate('tutorials')
         # Notify admin (if not uploader)
         if not current_user.is_admin:
-            from app.model import User, Notification
-            admin = User.query.filter_by(is_admin=True).first()
-            if admin:
-                notif = Notification(
-                    user_id=admin.id,
-                    message=f"{current_user.username} uploaded a new tutorial: '{form.title.data}'."
-                )
-                db.session.add(notif)
-                db.session.commit()
+            enqueue('notify_admin', message=f"{current_user.username} uploaded a new tutorial: '{form.title.data}'.",
+                    tutorial_id=new_tutorial.id)
+        db.session.commit()
         flash('Your tutorial has been uploaded successfully!', 'success')
         return redirect(url_for('dashboard'))
     return render_template('upload_tutorial.html', form=form)
+
+# Resumable video uploads: POST /api/uploads announces the file (Upload-Length
+# header plus the tutorial form), PATCH sends bytes starting at Upload-Offset,
+# and HEAD reports the confirmed offset so an interrupted client can resume.
+# PATCH and DELETE need a custom content type or method, so browsers won't
+# send them cross-site without a CORS preflight.
+def _upload_status(status, offset, length):
+    response = app.response_class(status=status)
+    response.headers['Upload-Offset'] = str(offset)
+    response.headers['Upload-Length'] = str(length)
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+def _own_upload(upload_id):
+    upload = Upload.query.get_or_404(upload_id)
+    if upload.user_id != current_user.id:
+        abort(404)
+    return upload
+
+@app.route('/api/uploads', methods=['POST'])
+@login_required
+def create_upload():
+    if not (current_user.is_admin or current_user.role == 'facilitator'):
+        abort(403)
+    form = TutorialForm()
+    if not form.validate_on_submit():
+        return jsonify(errors=form.errors), 400
+    filename = secure_filename(request.form.get('filename', ''))
+    if filename.rsplit('.', 1)[-1].lower() not in uploads.VIDEO_EXTENSIONS:
+        return jsonify(error='Please upload a supported video file (mp4, avi, mov, wmv, flv, mkv, webm).'), 400
+    length = request.headers.get('Upload-Length', type=int)
+    if length is None or length <= 0:
+        return jsonify(error='Upload-Length header is required.'), 400
+    if length > app.config['UPLOAD_MAX_SIZE']:
+        return jsonify(error='This video is too large.'), 413
+    if uploads.active_uploads(current_user.id) >= app.config['UPLOAD_MAX_ACTIVE']:
+        return jsonify(error='Please finish or cancel your other uploads first.'), 429
+    upload = Upload(
+        id=uuid.uuid4().hex,
+        user_id=current_user.id,
+        filename=filename,
+        length=length,
+        title=form.title.data,
+        category=form.category.data,
+        description=form.description.data
+    )
+    db.session.add(upload)
+    db.session.commit()
+    uploads.create_part(upload.id)
+    response = _upload_status(201, 0, length)
+    response.headers['Location'] = url_for('upload_offset', upload_id=upload.id)
+    return response
+
+@app.route('/api/uploads/<upload_id>', methods=['HEAD'])
+@login_required
+def upload_offset(upload_id):
+    upload = _own_upload(upload_id)
+    return _upload_status(200, upload.offset, upload.length)
+
+@app.route('/api/uploads/<upload_id>', methods=['PATCH'])
+@login_required
+def upload_chunk(upload_id):
+    upload = _own_upload(upload_id)
+    offset, length = upload.offset, upload.length
+    if request.mimetype != 'application/offset+octet-stream':
+        return _upload_status(415, offset, length)
+    if upload.status != 'uploading' or request.headers.get('Upload-Offset', type=int) != offset:
+        return _upload_status(409, offset, length)  # The client resumes from our Upload-Offset
+    # Release the write lock before the body streams in; it may take minutes
+    db.session.commit()
+    with uploads.stream_slot(upload_id) as refused:
+        if refused:
+            response = _upload_status(refused, offset, length)
+            response.headers['Retry-After'] = '5'
+            return response
+        # Check again now that no worker can be writing the part file: a chunk
+        # that finished since the check above has moved the offset
+        if not Upload.query.filter_by(id=upload_id, offset=offset, status='uploading').count():
+            db.session.rollback()
+            upload = Upload.query.get_or_404(upload_id)
+            return _upload_status(409, upload.offset, length)
+        db.session.commit()
+        written = uploads.append_chunk(upload_id, offset, length - offset, request.stream)
+        values = {'offset': offset + written, 'updated_at': datetime.utcnow()}
+        complete = offset + written == length
+        if complete:
+            values['status'] = 'assembling'
+        # Only the request that started at the confirmed offset may move it
+        moved = Upload.query.filter_by(id=upload_id, offset=offset, status='uploading').update(values)
+        if not moved:
+            db.session.rollback()
+            upload = Upload.query.get_or_404(upload_id)
+            return _upload_status(409, upload.offset, length)
+        if complete:
+            enqueue('assemble_upload', upload_id=upload_id)
+        db.session.commit()
+    if complete:
+        flash('Your video has been uploaded and will appear in your tutorials shortly.', 'success')
+    return _upload_status(204, offset + written, length)
+
+@app.route('/api/uploads/<upload_id>', methods=['DELETE'])
+@login_required
+def cancel_upload(upload_id):
+    upload = _own_upload(upload_id)
+    if upload.status != 'uploading':
+        return _upload_status(409, upload.offset, upload.length)
+    db.session.delete(upload)
+    db.session.commit()
+    uploads.remove_part(upload_id)
+    return '', 204
+
 @app.route('/add-comment/<int:tutorial_id>', methods=['POST'])
 @login_required
 def add_comment(tutorial_id):
@@ -190,17 +331,12 @@ def add_comment(tutorial_id):
         user_id=current_user.id
     )
     db.session.add(new_comment)
-    db.session.commit()
+    bump_engagement(tutorial_id, comments=1)
     # Notify tutorial uploader
-    tutorial = Tutorial.query.get(tutorial_id)
-    if tutorial and tutorial.uploaded_by != current_user.id:
-        from app.model import Notification
-        notif = Notification(
-            user_id=tutorial.uploaded_by,
-            message=f"{current_user.username} commented on your tutorial '{tutorial.title}'."
-        )
-        db.session.add(notif)
-        db.session.commit()
+    enqueue('notify_tutorial_comment', tutorial_id=tutorial_id,
+            commenter_id=current_user.id, commenter_name=current_user.username)
+    response_cache.invalidate(f'tutorial:{tutorial_id}')
+    db.session.commit()
     flash('Comment added successfully!', 'success')
     return redirect(url_for('tutorials', tutorial_id=tutorial_id))
 
@@ -223,21 +359,13 @@ def add_reply(comment_id):
         parent_id=parent_comment.id  # Set the parent_id to the parent comment's ID
     )
     db.session.add(new_reply)
-    db.session.commit()
+    bump_engagement(parent_comment.tutorial_id, replies=1)
     # Notify parent comment owner
     if parent_comment.user_id != current_user.id:
-        from app.model import Notification, Tutorial, User
-        tutorial = Tutorial.query.get(parent_comment.tutorial_id)
-        poster = User.query.get(tutorial.uploaded_by) if tutorial else None
-        poster_name = poster.username if poster else "Unknown"
-        notif = Notification(
-            user_id=parent_comment.user_id,
-            message=f"{current_user.username} replied to your comment on tutorial posted by {poster_name}.",
-            comment_id=new_reply.id,
-            is_read=False
-        )
-        db.session.add(notif)
-        db.session.commit()
+        db.session.flush()  # Assigns new_reply.id for the notification link
+        enqueue('notify_comment_reply', reply_id=new_reply.id, replier_name=current_user.username)
+    response_cache.invalidate(f'tutorial:{parent_comment.tutorial_id}')
+    db.session.commit()
     flash('Reply added successfully!', 'success')
     return redirect(url_for('tutorials', tutorial_id=parent_comment.tutorial_id))  
 # ...existing code...
@@ -247,12 +375,17 @@ def add_reply(comment_id):
 @login_required
 def notifications():
     from app.model import Notification, Comment
-    notifs = Notification.query.filter_by(user_id=current_user.id).order_by(Notification.timestamp.desc()).all()
-    # Build a dict of comment_id -> comment for fast lookup
-    comment_ids = [n.comment_id for n in notifs if n.comment_id]
-    comments = Comment.query.filter(Comment.id.in_(comment_ids)).all() if comment_ids else []
-    comments_dict = {c.id: c for c in comments}
-    return render_template('notifications.html', notifications=notifs, comments_dict=comments_dict)
+    # One page, newest first; ids grow with time
+    notifs, next_cursor = keyset_page(
+        Notification.query.filter_by(user_id=current_user.id), Notification.id,
+        request.args.get('after', type=int), app.config['NOTIFICATIONS_PAGE_SIZE']
+    )
+    # Resolve the link targets with one IN query per type, e.g. targets['tutorial'][7]
+    targets = {}
+    for model, column in ((Tutorial, 'tutorial_id'), (Product, 'product_id'), (Order, 'order_id'), (Comment, 'comment_id')):
+        ids = {getattr(n, column) for n in notifs if getattr(n, column)}
+        targets[model.__tablename__] = {row.id: row for row in model.query.filter(model.id.in_(ids))} if ids else {}
+    return render_template('notifications.html', notifications=notifs, targets=targets, next_cursor=next_cursor)
 
 @app.route('/dashboard')
 @login_required
@@ -260,8 +393,13 @@ def dashboard():
     # Fetch user-specific content (e.g., products and tutorials uploaded by the user)
     user_products = Product.query.filter_by(user_id=current_user.id).all()
     user_tutorials = Tutorial.query.filter_by(uploaded_by=current_user.id).all()
+    # Sales figures are precomputed on every order transition; no scan of Order here
+    seller_stats = db.session.get(SellerOrderStats, current_user.id)
+    product_stats = {stats.product_id: stats for stats in ProductOrderStats.query.filter(
+        ProductOrderStats.product_id.in_([product.id for product in user_products]))} if user_products else {}
 
-    return render_template('dashboard.html', user=current_user, products=user_products, tutorials=user_tutorials)
+    return render_template('dashboard.html', user=current_user, products=user_products, tutorials=user_tutorials,
+                           seller_stats=seller_stats, product_stats=product_stats)
 
 @app.route('/logout')
 @login_required
@@ -270,19 +408,49 @@ def logout():
     flash('You have been logged out.', 'success')
     return redirect(url_for('home'))
 
+def _tutorials_page():
+    category = request.args.get('category', None)
+    sort = 'active' if request.args.get('sort') == 'active' else None
+    # "Most active" reads the stored counters, paged by (activity, id)
+    after = parse_cursor(request.args.get('after')) if sort else request.args.get('after', type=int)
+
+    def render():
+        query = Tutorial.query.options(joinedload(Tutorial.uploader))
+        if category:
+            query = query.filter_by(category=category)
+        if sort:
+            tutorials, next_cursor = keyset_page(query, Tutorial.activity, after, app.config['PAGE_SIZE'],
+                                                 tiebreak=Tutorial.id)
+        else:
+            tutorials, next_cursor = keyset_page(query, Tutorial.id, after, app.config['PAGE_SIZE'])
+        return {'html': render_template('_tutorial_cards.html', tutorials=tutorials), 'next_cursor': next_cursor}
+
+    # The rendered cards are shared by everyone; they only differ in the admin's delete buttons.
+    # Their counts may lag by up to CACHE_TTL, so comments and views don't invalidate them
+    viewer = 'admin' if current_user.is_authenticated and current_user.is_admin else 'visitor'
+    cursor = ':'.join(map(str, after)) if isinstance(after, tuple) else after
+    cards = response_cache.fragment('tutorial-cards', f"{category}:{sort}:{cursor}:{viewer}", ['tutorials'], render)
+    return category, sort, cards
+
 @app.route('/tutorials', methods=['GET'])
+@response_cache.cached('tutorials')
 def tutorials():
-    category = request.args.get('category', None)
-    if category:
-        tutorials = Tutorial.query.filter_by(category=category).all()
-    else:
-        tutorials = Tutorial.query.all()
-    return render_template('tutorial.html', tutorials=tutorials)
+    category, sort, cards = _tutorials_page()
+    return render_template('tutorial.html', cards_html=Markup(cards['html']), selected_category=category,
+                           sort=sort, next_cursor=cards['next_cursor'])
+
+@app.route('/api/tutorials')
+@response_cache.cached('tutorials')
+def tutorials_fragment():
+    # Next page of tutorial cards for infinite scroll
+    category, sort, cards = _tutorials_page()
+    return jsonify(cards)
 
 @app.route('/tutorial/<int:tutorial_id>', methods=['GET', 'POST'])
+@view_counter.counts('tutorial_id')
+@response_cache.cached('tutorial:{tutorial_id}')
 def tutorial_detail(tutorial_id):
-    tutorial = Tutorial.query.get_or_404(tutorial_id)  # Fetch the tutorial by ID
-    comments = Comment.query.filter_by(tutorial_id=tutorial_id).all()  # Fetch comments for the tutorial
+    tutorial = Tutorial.query.options(joinedload(Tutorial.uploader)).get_or_404(tutorial_id)  # Fetch the tutorial by ID
 
     if request.method == 'POST':
         # Handle adding a comment
@@ -296,20 +464,69 @@ def tutorial_detail(tutorial_id):
                 user_id=current_user.id
             )
             db.session.add(new_comment)
+            bump_engagement(tutorial_id, comments=1)
+            response_cache.invalidate(f'tutorial:{tutorial_id}')
             db.session.commit()
             flash('Comment added successfully!', 'success')
         return redirect(url_for('tutorial_detail', tutorial_id=tutorial_id))
 
-    return render_template('tutorial_detail.html', tutorial=tutorial, comments=comments)
+    # One page of top-level comments, oldest first, with their authors
+    comments, next_cursor = keyset_page(
+        Comment.query.filter_by(tutorial_id=tutorial_id, parent_id=None).options(joinedload(Comment.user)),
+        Comment.id, request.args.get('after', type=int), app.config['COMMENTS_PAGE_SIZE'], descending=False
+    )
+    # All replies to those comments in a single query, grouped by parent in memory
+    replies_by_parent = {}
+    if comments:
+        replies = (Comment.query.filter(Comment.parent_id.in_([c.id for c in comments]))
+                   .options(joinedload(Comment.user)).order_by(Comment.id).all())
+        for reply in replies:
+            replies_by_parent.setdefault(reply.parent_id, []).append(reply)
+
+    return render_template('tutorial_detail.html', tutorial=tutorial, comments=comments,
+                           replies_by_parent=replies_by_parent, next_cursor=next_cursor)
 
 @app.route('/products', methods=['GET'])
+@response_cache.cached('products')
 def view_products():
-    all_products = Product.query.all()
-    for product in all_products:
-        print("Product Image Filename:", product.image_filename)  # Debugging
-    print("Products:", all_products)
-    return render_template('product.html', products=all_products)
-
+    products, next_cursor = keyset_page(Product.query, Product.id, request.args.get('after', type=int), app.config['PAGE_SIZE'])
+    return render_template('product.html', products=products, next_cursor=next_cursor)
+
+@app.route('/api/products')
+@response_cache.cached('products')
+def products_fragment():
+    # Next page of product cards for infinite scroll
+    products, next_cursor = keyset_page(Product.query, Product.id, request.args.get('after', type=int), app.config['PAGE_SIZE'])
+    return jsonify({'html': render_template('_product_cards.html', products=products), 'next_cursor': next_cursor})
+
+
+@app.route('/search')
+def search():
+    query = request.args.get('q', '').strip()
+    kind = request.args.get('type')
+    page = max(request.args.get('page', 1, type=int), 1)
+    tables = (kind,) if kind in SEARCHABLE else tuple(SEARCHABLE)
+    hits, has_next = run_search(query, tables, page, app.config['SEARCH_PAGE_SIZE'])
+    # Load the matching rows with one query per kind
+    tutorial_ids = [hit['id'] for hit in hits if hit['table'] == 'tutorial']
+    product_ids = [hit['id'] for hit in hits if hit['table'] == 'product']
+    items = {}
+    if tutorial_ids:
+        for tutorial in Tutorial.query.options(joinedload(Tutorial.uploader)).filter(Tutorial.id.in_(tutorial_ids)):
+            items['tutorial', tutorial.id] = tutorial
+    if product_ids:
+        for product in Product.query.filter(Product.id.in_(product_ids)):
+            items['product', product.id] = product
+    results = [dict(hit, item=items[hit['table'], hit['id']]) for hit in hits if (hit['table'], hit['id']) in items]
+    return render_template('search.html', query=query, kind=kind if kind in SEARCHABLE else None,
+                           results=results, page=page, has_next=has_next)
+
+@app.route('/api/cache-stats')
+@login_required
+def cache_stats():
+    if not current_user.is_admin:
+        abort(403)
+    return jsonify(response_cache.stats())
 
 @app.route('/test-static')
 def test_static():
@@ -318,17 +535,23 @@ def test_static():
 @app.route('/admin-dashboard', methods=['GET', 'POST'])
 @login_required
 def admin_dashboard():
-    print("Current User Admin Status:", current_user.is_admin)  # Debugging
     # Ensure only admin users can access this route
     if not current_user.is_admin:
         flash('You do not have permission to access this page.', 'danger')
         return redirect(url_for('home'))
 
-    # Fetch all tutorials and products
-    tutorials = Tutorial.query.all()
-    products = Product.query.all()
+    # Fetch one page each of tutorials and products; each list has its own cursor
+    page_size = app.config['PAGE_SIZE']
+    tutorials, next_tutorial_cursor = keyset_page(
+        Tutorial.query.options(joinedload(Tutorial.uploader)), Tutorial.id,
+        request.args.get('tutorials_after', type=int), page_size
+    )
+    products, next_product_cursor = keyset_page(
+        Product.query, Product.id, request.args.get('products_after', type=int), page_size
+    )
 
-    return render_template('admin_dashboard.html', tutorials=tutorials, products=products)
+    return render_template('admin_dashboard.html', tutorials=tutorials, products=products,
+                           next_tutorial_cursor=next_tutorial_cursor, next_product_cursor=next_product_cursor)
 
 @app.route('/delete-tutorial/<int:tutorial_id>', methods=['POST'])
 @login_required
@@ -339,7 +562,14 @@ def delete_tutorial(tutorial_id):
         return redirect(url_for('home'))
 
     tutorial = Tutorial.query.get_or_404(tutorial_id)
+    # Shared uploads and their renditions are reclaimed by the collect_blobs job
+    if tutorial.file_blob_id:
+        release_blob(tutorial.file_blob_id)
+    elif tutorial.hls_playlist:
+        remove_after_commit(derived_files('tutorials', tutorial.hls_playlist.rsplit('-', 1)[0]))
     db.session.delete(tutorial)
+    enqueue('collect_blobs')
+    response_cache.invalidate('tutorials', f'tutorial:{tutorial_id}')
     db.session.commit()
     flash('Tutorial deleted successfully.', 'success')
     return redirect(url_for('tutorials'))
@@ -355,8 +585,17 @@ def delete_product(product_id):
     # Fetch the product by ID
     product = Product.query.get_or_404(product_id)
 
-    # Delete the product
+    # Delete the product, its orders and its reference to the upload; shared
+    # uploads and their resized copies are reclaimed by the collect_blobs job
+    delete_product_orders(product.id)
+    if product.image_blob_id:
+        release_blob(product.image_blob_id)
+    else:
+        remove_after_commit(f"images/variants/{v['filename']}" for vs in product.variants_by_format().values() for v in vs)
     db.session.delete(product)
+    enqueue('collect_blobs')
+    response_cache.invalidate('products')
+    invalidate_user(product.user_id)
     db.session.commit()
 
     # Flash success message and redirect
@@ -379,9 +618,13 @@ def register_facilitator():
         if existing_user:
             flash('Username or email already exists. Please choose a different one.', 'danger')
             return redirect(url_for('register_facilitator'))
+        db.session.commit()  # Don't hold the write lock while hashing
 
         # Create a new facilitator
-        hashed_password = generate_password_hash(form.password.data)
+        try:
+            hashed_password = hasher.hash(form.password.data)
+        except HashingBusy:
+            return _hashing_busy('register_facilitator.html', form)
         new_facilitator = User(
             username=form.username.data,
             email=form.email.data,
@@ -407,7 +650,14 @@ def delete_comment(comment_id):
 
     comment = Comment.query.get_or_404(comment_id)
     tutorial_id = comment.tutorial_id
+    if comment.parent_id is None:
+        # Its replies are kept and become top-level comments
+        replies = comment.replies.count()
+        bump_engagement(tutorial_id, comments=replies - 1, replies=-replies)
+    else:
+        bump_engagement(tutorial_id, replies=-1)
     db.session.delete(comment)
+    response_cache.invalidate(f'tutorial:{tutorial_id}')
     db.session.commit()
     flash('Comment/reply deleted successfully.', 'success')
     return redirect(url_for('tutorial_detail', tutorial_id=tutorial_id))
@@ -419,7 +669,7 @@ def mark_read(notif_id):
     notif = Notification.query.get_or_404(notif_id)
     if notif.user_id != current_user.id:
         abort(403)
-    notif.is_read = True
+    notif.mark_read()
     db.session.commit()
     flash('Notification marked as read.', 'success')
     return redirect(url_for('notifications'))
@@ -431,7 +681,7 @@ def mark_unread(notif_id):
     notif = Notification.query.get_or_404(notif_id)
     if notif.user_id != current_user.id:
         abort(403)
-    notif.is_read = False
+    notif.mark_unread()
     db.session.commit()
     flash('Notification marked as unread.', 'info')
     return redirect(url_for('notifications'))
@@ -443,19 +693,109 @@ def delete_notification(notif_id):
     notif = Notification.query.get_or_404(notif_id)
     if notif.user_id != current_user.id:
         abort(403)
-    db.session.delete(notif)
+    notif.delete()
     db.session.commit()
     flash('Notification deleted.', 'warning')
     return redirect(url_for('notifications'))
 
+# Bulk actions from the notifications page; each is a single UPDATE or DELETE
+@app.route('/notifications/mark-read', methods=['POST'])
+@login_required
+def bulk_mark_read():
+    if request.form.get('scope') == 'all':
+        updated = mark_notifications_read(current_user.id)
+    else:
+        ids = request.form.getlist('ids', type=int)
+        if not ids:
+            flash('Select at least one notification.', 'warning')
+            return redirect(url_for('notifications'))
+        updated = mark_notifications_read(current_user.id, Notification.id.in_(ids))
+    db.session.commit()
+    flash(f'{updated} notification(s) marked as read.', 'success')
+    return redirect(url_for('notifications'))
+
+@app.route('/notifications/delete', methods=['POST'])
+@login_required
+def bulk_delete_notifications():
+    ids = request.form.getlist('ids', type=int)
+    if not ids:
+        flash('Select at least one notification.', 'warning')
+        return redirect(url_for('notifications'))
+    deleted = delete_notifications(Notification.user_id == current_user.id, Notification.id.in_(ids))
+    db.session.commit()
+    flash(f'{deleted} notification(s) deleted.', 'warning')
+    return redirect(url_for('notifications'))
+
+@app.route('/notifications/delete-older', methods=['POST'])
+@login_required
+def delete_old_notifications():
+    days = request.form.get('days', type=int)
+    if not days or days < 1:
+        flash('Choose how many days of notifications to keep.', 'danger')
+        return redirect(url_for('notifications'))
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    deleted = delete_notifications(Notification.user_id == current_user.id, Notification.timestamp < cutoff)
+    db.session.commit()
+    flash(f'{deleted} notification(s) older than {days} days deleted.', 'warning')
+    return redirect(url_for('notifications'))
+
 # API endpoint for unread notification count
 from flask import jsonify
 
 @app.route('/api/unread_notification_count')
 @login_required
 def unread_notification_count():
-    count = current_user.notifications.filter_by(is_read=False).count()
-    return jsonify({'count': count})
+    return jsonify({'count': current_user.unread_notification_count})
+
+# Server-Sent Events stream of unread-count changes
+@app.route('/api/notifications/stream')
+@login_required
+def notification_stream():
+    user_id = current_user.id
+    resync = app.config['NOTIFICATION_RESYNC_INTERVAL']
+    # Subscribe before reading the count so nothing published in between is missed
+    events = hub.subscribe(user_id)
+
+    def read_count():
+        count = db.session.query(User.unread_notification_count).filter_by(id=user_id).scalar()
+        # Hand the connection back to the pool while the stream waits
+        db.session.close()
+        return count or 0
+
+    count = read_count()
+
+    def generate():
+        nonlocal count
+        next_resync = time.monotonic() + resync
+        try:
+            yield "retry: 5000\n"
+            yield f"data: {json.dumps({'count': count})}\n\n"
+            while True:
+                try:
+                    payload = events.get(timeout=15)
+                except queue.Empty:
+                    payload = None
+                if resync and time.monotonic() >= next_resync:
+                    # Catches changes published where this process can't hear them
+                    # (e.g. `flask run-jobs` without NOTIFICATION_PUBSUB_URL)
+                    next_resync = time.monotonic() + resync
+                    fresh = read_count()
+                    if fresh != count:
+                        count = fresh
+                        yield f"data: {json.dumps({'count': count})}\n\n"
+                        continue
+                if payload is None:
+                    yield ": keepalive\n\n"
+                    continue
+                count = payload['count']
+                yield f"data: {json.dumps(payload)}\n\n"
+        finally:
+            hub.unsubscribe(user_id, events)
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 @app.route('/place-order/<int:product_id>', methods=['POST'])
 @login_required
@@ -465,23 +805,23 @@ def place_order(product_id):
         flash('You cannot order your own product.', 'warning')
         return redirect(url_for('view_products'))
 
-    # Prevent duplicate orders by the same user for the same product if still pending
-    existing_order = Order.query.filter_by(product_id=product_id, buyer_id=current_user.id, status='pending').first()
-    if existing_order:
-        flash('You have already placed an order for this product. Please wait for the seller to respond.', 'info')
+    # Optional client key: a retried or double-submitted POST carries the same one
+    key = request.headers.get('Idempotency-Key') or request.form.get('idempotency_key') or None
+    if key is not None and len(key) > 64:
+        abort(400)
+
+    # A duplicate pending order or a replayed key inserts nothing
+    order_id = insert_order(product_id, current_user.id, product.user_id, idempotency_key=key)
+    if order_id is None:
+        if key is not None and Order.query.filter_by(buyer_id=current_user.id, idempotency_key=key).first():
+            # Already placed by an earlier attempt; answer as that attempt did
+            flash('Order placed successfully! The seller will be notified.', 'success')
+        else:
+            flash('You have already placed an order for this product. Please wait for the seller to respond.', 'info')
         return redirect(url_for('view_products'))
 
-    # Create the order
-    order = Order(product_id=product_id, buyer_id=current_user.id, seller_id=product.user_id)
-    db.session.add(order)
-    db.session.commit()
-
-    # Notify the seller
-    notif = Notification(
-        user_id=product.user_id,
-        message=f"{current_user.username} placed an order for your product '{product.name}'.",
-    )
-    db.session.add(notif)
+    # Notify the seller; queued in the same transaction as the order
+    enqueue('notify_new_order', product_id=product_id, buyer_name=current_user.username, order_id=order_id)
     db.session.commit()
 
     flash('Order placed successfully! The seller will be notified.', 'success')
@@ -490,44 +830,63 @@ def place_order(product_id):
 @app.route('/seller/orders')
 @login_required
 def seller_orders():
-    # Only show orders where the current user is the seller
-    orders = Order.query.filter_by(seller_id=current_user.id).order_by(Order.timestamp.desc()).all()
-    return render_template('seller_orders.html', orders=orders)
+    # Only show orders where the current user is the seller, a page at a time, optionally one status
+    status = request.args.get('status')
+    if status not in {s.value for s in OrderStatus}:
+        status = None
+    query = Order.query.filter_by(seller_id=current_user.id).options(joinedload(Order.product), joinedload(Order.buyer))
+    if status:
+        query = query.filter_by(status=status)
+    orders, next_cursor = keyset_page(query, Order.id, request.args.get('after', type=int), app.config['ORDERS_PAGE_SIZE'])
+    return render_template('seller_orders.html', orders=orders, status=status, next_cursor=next_cursor)
+
+def _set_order_status(order_ids, status):
+    """
+    Moves the current seller's orders among order_ids to status (those the
+    state machine allows) and queues a single job to notify their buyers.
+    Returns the ids that changed.
+    """
+    changed = transition_orders(status, current_user.id, Order.seller_id == current_user.id, Order.id.in_(order_ids))
+    if changed:
+        enqueue('notify_order_status', status=status, order_ids=changed)
+    return changed
+
+def _change_order(order_id, status, verb):
+    order = Order.query.get_or_404(order_id)
+    if order.seller_id != current_user.id:
+        flash(f'You do not have permission to {verb} this order.', 'danger')
+    elif not can_transition(order.status, status) or not _set_order_status([order.id], status):
+        flash(f'This order is already {order.status.value} and can no longer be changed.', 'info')
+    else:
+        db.session.commit()
+        return True
+    return False
 
 @app.route('/order/<int:order_id>/accept', methods=['POST'])
 @login_required
 def accept_order(order_id):
-    order = Order.query.get_or_404(order_id)
-    if order.seller_id != current_user.id:
-        flash('You do not have permission to accept this order.', 'danger')
-        return redirect(url_for('seller_orders'))
-    order.status = 'accepted'
-    db.session.commit()
-    # Notify the buyer
-    notif = Notification(
-        user_id=order.buyer_id,
-        message=f"Your order for '{order.product.name}' has been accepted!"
-    )
-    db.session.add(notif)
-    db.session.commit()
-    flash('Order accepted.', 'success')
+    if _change_order(order_id, 'accepted', 'accept'):
+        flash('Order accepted.', 'success')
     return redirect(url_for('seller_orders'))
 
 @app.route('/order/<int:order_id>/reject', methods=['POST'])
 @login_required
 def reject_order(order_id):
-    order = Order.query.get_or_404(order_id)
-    if order.seller_id != current_user.id:
-        flash('You do not have permission to reject this order.', 'danger')
-        return redirect(url_for('seller_orders'))
-    order.status = 'rejected'
-    db.session.commit()
-    # Notify the buyer
-    notif = Notification(
-        user_id=order.buyer_id,
-        message=f"Your order for '{order.product.name}' has been rejected."
-    )
-    db.session.add(notif)
+    if _change_order(order_id, 'rejected', 'reject'):
+        flash('Order rejected.', 'info')
+    return redirect(url_for('seller_orders'))
+
+# Bulk accept/reject from the order inbox: one UPDATE, one notification job, one commit
+@app.route('/seller/orders/bulk', methods=['POST'])
+@login_required
+def bulk_update_orders():
+    status = {'accept': 'accepted', 'reject': 'rejected'}.get(request.form.get('action'))
+    ids = request.form.getlist('ids', type=int)
+    back = url_for('seller_orders', status=request.form.get('status') or None)
+    if status is None or not ids:
+        flash('Select at least one pending order.', 'warning')
+        return redirect(back)
+    changed = _set_order_status(ids, status)
     db.session.commit()
-    flash('Order rejected.', 'info')
-    return redirect(url_for('seller_orders'))
\ No newline at end of file
+    flash(f'{len(changed)} order(s) {status}.', 'success' if status == 'accepted' else 'info')
+    return redirect(back)
\ No newline at end of file
@@ -0,0 +1,112 @@
+import re
+from markupsafe import Markup, escape
+from sqlalchemy import event, text
+from app import db
+
+# Full-text search over tutorials and products. On SQLite every table gets an
+# FTS5 index that triggers keep in step with the table itself, so bulk
+# updates are indexed too; on Postgres a GIN index over the same tsvector
+# expression the queries use. Both are created by migrations (or create_all).
+
+# Indexed columns per searchable table; the first is the title
+SEARCHABLE = {
+    'tutorial': ('title', 'description'),
+    'product': ('name', 'description'),
+}
+TITLE_WEIGHT = 10.0  # A match in the title counts ten times one in the description
+MAX_TERMS = 10
+_START, _STOP = '\x02', '\x03'  # Highlight markers, swapped for <mark> after escaping
+
+
+def sqlite_ddl(table):
+    title, body = SEARCHABLE[table]
+    fts = f'{table}_fts'
+    return [
+        # prefix='2 3' keeps short prefix queries ("so*") off a full index scan
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({title}, {body}, content='{table}', "
+        f"content_rowid='id', tokenize='porter unicode61 remove_diacritics 2', prefix='2 3')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {title}, {body}) VALUES (new.id, new.{title}, new.{body}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {title}, {body}) VALUES ('delete', old.id, old.{title}, old.{body}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {title}, {body} ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {title}, {body}) VALUES ('delete', old.id, old.{title}, old.{body}); "
+        f"INSERT INTO {fts}(rowid, {title}, {body}) VALUES (new.id, new.{title}, new.{body}); END",
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def postgres_document(table):
+    title, body = SEARCHABLE[table]
+    return (f"setweight(to_tsvector('english', coalesce({title}, '')), 'A') || "
+            f"setweight(to_tsvector('english', coalesce({body}, '')), 'B')")
+
+
+def postgres_ddl(table):
+    return [f"CREATE INDEX IF NOT EXISTS ix_{table}_search ON {table} USING gin (({postgres_document(table)}))"]
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _create_search_indexes(metadata, connection, **kwargs):
+    ddl = {'sqlite': sqlite_ddl, 'postgresql': postgres_ddl}.get(connection.dialect.name)
+    if ddl:
+        for table in SEARCHABLE:
+            for statement in ddl(table):
+                connection.exec_driver_sql(statement)
+
+
+def search_terms(query):
+    """Words of a user query; punctuation and search operators are dropped."""
+    return re.findall(r'\w+', query.lower())[:MAX_TERMS]
+
+
+def search(query, tables=('tutorial', 'product'), page=1, per_page=20):
+    """
+    Returns (hits, has_next) for one page of ranked matches across tables.
+    Every word matches as a prefix, so "moist soap" finds "moisturising
+    soaps". A hit is a dict with the table, the row id, a relevance score
+    (lower is better) and the highlighted title and snippet as Markup.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return [], False
+    # Rank merging needs the top rows of every table up to the end of this page
+    limit = page * per_page + 1
+    search_table = _search_sqlite if db.engine.dialect.name == 'sqlite' else _search_postgres
+    hits = []
+    for table in tables:
+        hits.extend(search_table(table, terms, limit))
+    hits.sort(key=lambda hit: hit['score'])
+    start = (page - 1) * per_page
+    return hits[start:start + per_page], len(hits) > page * per_page
+
+
+def _search_sqlite(table, terms, limit):
+    fts = f'{table}_fts'
+    rows = db.session.execute(text(
+        f"SELECT rowid, highlight({fts}, 0, :start, :stop), snippet({fts}, 1, :start, :stop, '…', 24), "
+        f"bm25({fts}, {TITLE_WEIGHT}, 1.0) AS score "
+        f"FROM {fts} WHERE {fts} MATCH :match ORDER BY score LIMIT :limit"
+    ), {'match': ' '.join(f'"{term}"*' for term in terms), 'start': _START, 'stop': _STOP, 'limit': limit})
+    return [_hit(table, *row) for row in rows]
+
+
+def _search_postgres(table, terms, limit):
+    title, body = SEARCHABLE[table]
+    document = postgres_document(table)
+    options = f'StartSel={_START}, StopSel={_STOP}, MaxWords=24, MinWords=12'
+    rows = db.session.execute(text(
+        f"SELECT id, ts_headline('english', {title}, q, :whole), ts_headline('english', coalesce({body}, ''), q, :options), "
+        f"-ts_rank_cd({document}, q, 1) AS score "
+        f"FROM {table}, to_tsquery('english', :match) AS q WHERE {document} @@ q ORDER BY score LIMIT :limit"
+    ), {'match': ' & '.join(f'{term}:*' for term in terms), 'whole': options + ', HighlightAll=true',
+        'options': options, 'limit': limit})
+    return [_hit(table, *row) for row in rows]
+
+
+def _hit(table, row_id, title, snippet, score):
+    return {'table': table, 'id': row_id, 'title': _highlight(title), 'snippet': _highlight(snippet), 'score': score}
+
+
+def _highlight(value):
+    return Markup(str(escape(value or '')).replace(_START, '<mark>').replace(_STOP, '</mark>'))
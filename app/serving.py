@@ -0,0 +1,78 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+from flask import abort, current_app, request, send_file
+from werkzeug.security import safe_join
+
+# Uploads are stored under their content hash (see app/storage.py), and
+# derived files such as image variants start with it, so their URL changes
+# whenever their bytes do and browsers may cache them for good.
+FINGERPRINTED = re.compile(r'(^|/)[0-9a-f]{64}(-[^/]*)?\.[A-Za-z0-9]+$')
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+def init_app(app):
+    """Serves /static through send_media instead of Flask's default handler."""
+    app.config.setdefault('MEDIA_MAX_AGE', None)  # None = browsers revalidate other static files every time
+    app.config.setdefault('MEDIA_ACCEL_REDIRECT', None)  # Internal nginx location mapped to STORAGE_ROOT, e.g. /_media/
+    app.view_functions['static'] = send_media
+
+
+def is_fingerprinted(filename):
+    return bool(FINGERPRINTED.search(filename))
+
+
+def media_etag(filename, stat):
+    """
+    Strong ETag for a static file. Fingerprinted files are named after their
+    content, so the name is the tag; other files use modification time and
+    size like nginx does, which avoids hashing whole videos on a request.
+    """
+    if is_fingerprinted(filename):
+        return os.path.basename(filename)
+    return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+
+def send_media(filename):
+    """
+    Sends a file from STORAGE_ROOT with a strong ETag, 304s for If-None-Match and
+    206 partial content for Range requests so video seeking fetches only
+    what it needs. Fingerprinted files are marked immutable for a year.
+
+    With MEDIA_ACCEL_REDIRECT (nginx) or USE_X_SENDFILE (Apache, lighttpd)
+    the proxy sends the bytes and answers range requests itself; the worker
+    only checks the path and sets the headers.
+    """
+    path = safe_join(current_app.config['STORAGE_ROOT'], filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+    stat = os.stat(path)
+    etag = media_etag(filename, stat)
+    fingerprinted = is_fingerprinted(filename)
+    max_age = IMMUTABLE_MAX_AGE if fingerprinted else current_app.config['MEDIA_MAX_AGE']
+
+    if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+    elif current_app.config['MEDIA_ACCEL_REDIRECT']:
+        response = current_app.response_class(mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+        response.headers['X-Accel-Redirect'] = current_app.config['MEDIA_ACCEL_REDIRECT'].rstrip('/') + '/' + quote(filename)
+    else:
+        # Range handling is left to the proxy when it sends the file (X-Sendfile)
+        conditional = not current_app.config['USE_X_SENDFILE']
+        return _cache_headers(send_file(path, etag=etag, max_age=max_age, conditional=conditional), fingerprinted, max_age)
+    response.set_etag(etag)
+    return _cache_headers(response, fingerprinted, max_age)
+
+
+def _cache_headers(response, fingerprinted, max_age):
+    if fingerprinted:
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+        response.cache_control.immutable = True
+    elif not max_age:
+        response.cache_control.no_cache = True
+    else:
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+    return response
@@ -0,0 +1,121 @@
+import glob
+import hashlib
+import os
+import tempfile
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from werkzeug.utils import secure_filename
+from app import db
+from app.model import Blob
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def storage_root():
+    """Directory holding uploaded files and their derivatives, served at /static (STORAGE_ROOT)."""
+    return current_app.config['STORAGE_ROOT']
+
+
+def store_upload(file_storage, folder):
+    """
+    Streams an uploaded file to disk in chunks while hashing it and returns
+    the Blob for its content with one more reference. Identical uploads share
+    one file; the name is the content hash, so it never collides or changes.
+    The file is staged in UPLOAD_TEMP_DIR, out of public reach, and moved
+    into place when the current transaction commits.
+    """
+    name = secure_filename(file_storage.filename)
+    ext = name.rsplit('.', 1)[-1].lower() if '.' in name else ''
+    temp_dir = current_app.config['UPLOAD_TEMP_DIR']
+    os.makedirs(temp_dir, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    fd, temp_path = tempfile.mkstemp(dir=temp_dir, suffix='.part')
+    with os.fdopen(fd, 'wb') as out:
+        for chunk in iter(lambda: file_storage.stream.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+            size += len(chunk)
+            out.write(chunk)
+    return acquire_blob(temp_path, folder, ext, digest.hexdigest(), size)
+
+
+def acquire_blob(temp_path, folder, ext, sha256, size):
+    """Finds or creates the Blob for already-hashed content in temp_path and takes a reference."""
+    path = f"{folder}/{sha256}.{ext}" if ext else f"{folder}/{sha256}"
+    blob = Blob.query.filter_by(path=path).first()
+    if blob is None:
+        try:
+            with db.session.begin_nested():
+                blob = Blob(path=path, sha256=sha256, size=size, ref_count=0)
+                db.session.add(blob)
+        except IntegrityError:
+            # A concurrent upload of the same content created it first
+            blob = Blob.query.filter_by(path=path).one()
+    Blob.query.filter_by(id=blob.id).update({Blob.ref_count: Blob.ref_count + 1})
+    final_path = os.path.join(storage_root(), path)
+    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+    db.session.info.setdefault('pending_files', []).append((temp_path, final_path))
+    return blob
+
+
+def release_blob(blob_id):
+    """Drops one reference; unreferenced blobs are removed by collect_garbage()."""
+    if blob_id is not None:
+        Blob.query.filter_by(id=blob_id).update({Blob.ref_count: Blob.ref_count - 1})
+
+
+def remove_after_commit(paths):
+    """Deletes derived files (relative to STORAGE_ROOT) once the current transaction commits."""
+    root = storage_root()
+    db.session.info.setdefault('discarded_files', []).extend(os.path.join(root, p) for p in paths)
+
+
+def derived_files(folder, stem):
+    """Paths (relative to STORAGE_ROOT) of the files generated from an upload, e.g. resized images or video renditions."""
+    root = storage_root()
+    pattern = os.path.join(root, folder, 'variants', f"{glob.escape(stem)}-*")
+    return [os.path.relpath(path, root) for path in glob.glob(pattern)]
+
+
+def collect_garbage():
+    """
+    Deletes every blob with no references, row and file together, and returns
+    how many were reclaimed. Run it in a write transaction: the conditional
+    DELETE skips blobs that picked up a new reference, and the file is removed
+    while the write lock is held. An upload that re-creates the blob
+    afterwards writes the file again after its own commit.
+    """
+    reclaimed = 0
+    for blob in Blob.query.filter(Blob.ref_count <= 0).all():
+        if Blob.query.filter(Blob.id == blob.id, Blob.ref_count <= 0).delete(synchronize_session=False):
+            # Derived copies (e.g. resized images) are named after the content hash too
+            derived = derived_files(os.path.dirname(blob.path), blob.sha256)
+            for path in [os.path.join(storage_root(), p) for p in [blob.path] + derived]:
+                if os.path.exists(path):
+                    os.remove(path)
+            reclaimed += 1
+    return reclaimed
+
+
+@event.listens_for(db.session, 'after_commit')
+def _place_files(session):
+    for temp_path, final_path in session.info.pop('pending_files', []):
+        if os.path.exists(final_path):
+            os.remove(temp_path)  # Same content is already stored
+        else:
+            os.replace(temp_path, final_path)
+    for path in session.info.pop('discarded_files', []):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+@event.listens_for(db.session, 'after_transaction_end')
+def _discard_files(session, transaction):
+    # Runs after _place_files on commit, so whatever is left was never committed: the
+    # transaction was rolled back, or the session closed or removed after an error
+    if transaction.parent is None:  # Ignore savepoints
+        for temp_path, final_path in session.info.pop('pending_files', []):
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        session.info.pop('discarded_files', None)
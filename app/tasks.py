@@ -0,0 +1,247 @@
+import json
+import os
+from datetime import datetime, timedelta
+from flask import current_app
+from app import db
+from app.cache import response_cache
+from app.jobs import job, enqueue, heartbeat
+from app.media import process_image, transcode_hls, video_tools_available
+from app.storage import acquire_blob, collect_garbage
+from app.uploads import VIDEO_EXTENSIONS, hash_file, part_path
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import joinedload
+from app.model import User, Tutorial, Comment, Order, Product, Upload, Notification, NotificationKind
+from app.model import add_notification, add_grouped_notification, delete_notifications
+
+# Handlers for work that routes queue with enqueue() instead of doing inline
+
+
+def _and_others(name, actors):
+    """Names the latest actor of a grouped notification, e.g. 'alice and 2 others' for 3 distinct users."""
+    if actors == 1:
+        return name
+    return f"{name} and {actors - 1} other{'s' if actors > 2 else ''}"
+
+
+@job('notify_user')
+def notify_user(user_id, message, comment_id=None):
+    add_notification(user_id, message, comment_id=comment_id)
+
+
+@job('notify_admin')
+def notify_admin(message, tutorial_id=None, product_id=None):
+    admin = User.query.filter_by(is_admin=True).first()
+    if admin:
+        kind = NotificationKind.NEW_UPLOAD if tutorial_id or product_id else NotificationKind.MESSAGE
+        add_notification(admin.id, message, kind=kind, tutorial_id=tutorial_id, product_id=product_id)
+
+
+@job('notify_tutorial_comment')
+def notify_tutorial_comment(tutorial_id, commenter_id, commenter_name):
+    tutorial = Tutorial.query.get(tutorial_id)
+    if tutorial and tutorial.uploaded_by != commenter_id:
+        add_grouped_notification(
+            tutorial.uploaded_by, NotificationKind.TUTORIAL_COMMENT, tutorial_id, commenter_name,
+            lambda count, actors: f"{commenter_name} commented on your tutorial '{tutorial.title}'." if count == 1 else
+            f"{_and_others(commenter_name, actors)} left {count} comments on your tutorial '{tutorial.title}'.",
+            tutorial_id=tutorial_id
+        )
+
+
+@job('notify_comment_reply')
+def notify_comment_reply(reply_id, replier_name):
+    reply = Comment.query.get(reply_id)
+    if reply is None:
+        return  # Deleted before the job ran
+    tutorial = Tutorial.query.get(reply.tutorial_id)
+    poster = User.query.get(tutorial.uploaded_by) if tutorial else None
+    poster_name = poster.username if poster else "Unknown"
+    add_grouped_notification(
+        reply.parent.user_id, NotificationKind.COMMENT_REPLY, reply.parent_id, replier_name,
+        lambda count, actors: f"{replier_name} replied to your comment on tutorial posted by {poster_name}." if count == 1 else
+        f"{_and_others(replier_name, actors)} left {count} replies to your comment on tutorial posted by {poster_name}.",
+        comment_id=reply.id, tutorial_id=reply.tutorial_id
+    )
+
+
+@job('notify_new_order')
+def notify_new_order(product_id, buyer_name, order_id=None):
+    product = Product.query.get(product_id)
+    if product is None:
+        return
+    add_grouped_notification(
+        product.user_id, NotificationKind.ORDER_PLACED, product_id, buyer_name,
+        lambda count, actors: f"{buyer_name} placed an order for your product '{product.name}'." if count == 1 else
+        f"{_and_others(buyer_name, actors)} placed {count} orders for your product '{product.name}'.",
+        product_id=product_id, order_id=order_id
+    )
+
+
+@job('notify_order_status')
+def notify_order_status(status, order_id=None, order_ids=()):
+    # Bulk accept/reject queues one job for all of its orders
+    ids = list(order_ids) + ([order_id] if order_id is not None else [])
+    for order in Order.query.options(joinedload(Order.product)).filter(Order.id.in_(ids)):
+        if status == 'accepted':
+            message = f"Your order for '{order.product.name}' has been accepted!"
+        else:
+            message = f"Your order for '{order.product.name}' has been rejected."
+        add_notification(order.buyer_id, message, kind=NotificationKind.ORDER_STATUS,
+                         order_id=order.id, product_id=order.product_id)
+
+
+@job('process_product_image')
+def process_product_image(product_id):
+    product = Product.query.get(product_id)
+    if product is None:
+        return
+    image_filename = product.image_filename
+    stem = os.path.splitext(image_filename)[0]
+    if product.image_blob_id:
+        # Content-addressed uploads share their variants with every product using the same file
+        twin = Product.query.filter(Product.image_blob_id == product.image_blob_id,
+                                    Product.image_variants.isnot(None)).first()
+        if twin:
+            product.image_variants = twin.image_variants
+            response_cache.invalidate('products')
+            return
+    else:
+        stem = f"{product_id}-{stem}"  # Legacy filenames aren't unique
+    # Don't hold the database write lock while images are encoded
+    db.session.commit()
+    images_dir = os.path.join(current_app.config['STORAGE_ROOT'], 'images')
+    variants = process_image(
+        os.path.join(images_dir, image_filename),
+        os.path.join(images_dir, 'variants'),
+        stem,
+        current_app.config['MEDIA_WORKERS']
+    )
+    if variants:
+        Product.query.filter_by(id=product_id).update({'image_variants': json.dumps(variants)})
+        response_cache.invalidate('products')
+
+
+@job('collect_blobs')
+def collect_blobs():
+    collect_garbage()
+
+
+@job('assemble_upload')
+def assemble_upload(upload_id):
+    upload = Upload.query.get(upload_id)
+    if upload is None or upload.status != 'assembling':
+        return
+    path = part_path(upload_id)
+    # Don't hold the database write lock while the video is hashed
+    db.session.commit()
+    sha256 = hash_file(path)
+    upload = Upload.query.get(upload_id)
+    blob = acquire_blob(path, 'tutorials', upload.extension, sha256, upload.length)
+    tutorial = Tutorial(
+        title=upload.title,
+        category=upload.category,
+        description=upload.description,
+        file_path=blob.filename,
+        file_blob_id=blob.id,
+        uploaded_by=upload.user_id
+    )
+    db.session.add(tutorial)
+    db.session.flush()  # Assigns the tutorial id for the transcoding job
+    enqueue('transcode_tutorial_video', tutorial_id=tutorial.id)
+    response_cache.invalidate('tutorials')
+    if not upload.user.is_admin:
+        enqueue('notify_admin', message=f"{upload.user.username} uploaded a new tutorial: '{upload.title}'.",
+                tutorial_id=tutorial.id)
+    db.session.delete(upload)
+
+
+@job('transcode_tutorial_video')
+def transcode_tutorial_video(tutorial_id):
+    tutorial = Tutorial.query.get(tutorial_id)
+    if tutorial is None or tutorial.hls_playlist or not tutorial.file_path:
+        return
+    file_path = tutorial.file_path
+    stem, ext = os.path.splitext(file_path)
+    if ext[1:].lower() not in VIDEO_EXTENSIONS:
+        return
+    config = current_app.config
+    if not video_tools_available(config['FFMPEG_BINARY'], config['FFPROBE_BINARY']):
+        return
+    if tutorial.file_blob_id:
+        # Content-addressed uploads share their renditions with every tutorial using the same file
+        twin = Tutorial.query.filter(Tutorial.file_blob_id == tutorial.file_blob_id,
+                                     Tutorial.hls_playlist.isnot(None)).first()
+        if twin:
+            tutorial.hls_playlist = twin.hls_playlist
+            tutorial.poster_filename = twin.poster_filename
+            tutorial.duration = twin.duration
+            response_cache.invalidate(f'tutorial:{tutorial_id}')
+            return
+    else:
+        stem = f"{tutorial_id}-{stem}"  # Legacy filenames aren't unique
+    # Don't hold the database write lock while the video is encoded
+    db.session.commit()
+    tutorials_dir = os.path.join(current_app.config['STORAGE_ROOT'], 'tutorials')
+    result = transcode_hls(
+        os.path.join(tutorials_dir, file_path),
+        os.path.join(tutorials_dir, 'variants'),
+        stem,
+        ffmpeg=config['FFMPEG_BINARY'],
+        ffprobe=config['FFPROBE_BINARY'],
+        heartbeat=heartbeat
+    )
+    if result:
+        Tutorial.query.filter_by(id=tutorial_id).update({
+            'hls_playlist': result['playlist'],
+            'poster_filename': result['poster'],
+            'duration': result['duration'],
+        })
+        response_cache.invalidate(f'tutorial:{tutorial_id}')
+
+
+@job('compact_notifications')
+def compact_notifications():
+    """
+    Deletes read notifications older than NOTIFICATION_RETENTION_DAYS, and
+    unread ones older than NOTIFICATION_MAX_AGE_DAYS, a batch per transaction
+    so the write lock is never held for long.
+    """
+    now = datetime.utcnow()
+    read_cutoff = now - timedelta(days=current_app.config['NOTIFICATION_RETENTION_DAYS'])
+    cutoff = now - timedelta(days=current_app.config['NOTIFICATION_MAX_AGE_DAYS'])
+    expired = or_(and_(Notification.is_read.is_(True), Notification.timestamp < read_cutoff), Notification.timestamp < cutoff)
+    batch_size = current_app.config['NOTIFICATION_COMPACT_BATCH']
+    while True:
+        # Old rows have the lowest ids, so walking the table in id order finds them first
+        batch = db.select(Notification.id).where(expired).order_by(Notification.id).limit(batch_size)
+        deleted = delete_notifications(Notification.id.in_(batch.scalar_subquery()))
+        db.session.commit()
+        if deleted < batch_size:
+            break
+        heartbeat()
+
+
+@job('send_notification_digests')
+def send_notification_digests():
+    """
+    Rolls each user's grouped notifications that have stayed unread for
+    NOTIFICATION_DIGEST_HOURS into one digest notification (when there are
+    at least two), committing a user at a time.
+    """
+    cutoff = datetime.utcnow() - timedelta(hours=current_app.config['NOTIFICATION_DIGEST_HOURS'])
+    stale = and_(Notification.is_read.is_(False), Notification.group_key.isnot(None),
+                 Notification.group_key != 'digest', Notification.timestamp < cutoff)
+    user_ids = [user_id for (user_id,) in db.session.query(Notification.user_id).filter(stale).distinct()]
+    for user_id in user_ids:
+        rows = (db.session.query(Notification.id, Notification.count, Notification.message)
+                .filter(stale, Notification.user_id == user_id).order_by(Notification.count.desc()).all())
+        if len(rows) < 2:
+            continue  # Nothing to roll up
+        total = sum(row.count for row in rows)
+        message = f"{total} updates in {len(rows)} conversations while you were away. Busiest: {rows[0].message}"
+        delete_notifications(Notification.id.in_([row.id for row in rows]))
+        digest = add_notification(user_id, message[:256], kind=NotificationKind.DIGEST)
+        digest.group_key = 'digest'
+        digest.count = total
+        db.session.commit()
+        heartbeat()
@@ -0,0 +1,132 @@
+import hashlib
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from flask import current_app
+from werkzeug.exceptions import ClientDisconnected
+from app import db
+from app.model import Upload
+from app.storage import CHUNK_SIZE
+
+try:
+    import fcntl
+except ImportError:  # Windows: only chunks arriving in the same process are kept apart
+    fcntl = None
+
+# Resumable uploads: the client announces the total size, then sends the file
+# in PATCH requests that each start at the offset the server has confirmed.
+# Bytes go straight from the socket to a part file, so a dropped connection
+# only loses the chunk in flight and a worker is never tied up for the whole
+# video. The tutorial is created by a background job once the file is complete.
+
+VIDEO_EXTENSIONS = {'mp4', 'avi', 'mov', 'wmv', 'flv', 'mkv', 'webm'}
+
+_streams_lock = threading.Lock()
+_receiving = set()  # Uploads with a chunk arriving in this process
+
+
+def part_path(upload_id):
+    return os.path.join(current_app.config['UPLOAD_TEMP_DIR'], f"{upload_id}.part")
+
+
+def create_part(upload_id):
+    """Creates the empty file that chunks are written into."""
+    os.makedirs(current_app.config['UPLOAD_TEMP_DIR'], exist_ok=True)
+    open(part_path(upload_id), 'wb').close()
+
+
+def remove_part(upload_id):
+    path = part_path(upload_id)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def active_uploads(user_id):
+    """Number of unfinished, unexpired uploads a user has open."""
+    return Upload.query.filter(
+        Upload.user_id == user_id,
+        Upload.status == 'uploading',
+        Upload.updated_at >= _expiry_cutoff()
+    ).count()
+
+
+@contextmanager
+def stream_slot(upload_id):
+    """
+    Reserves one of this process's UPLOAD_MAX_STREAMS slots for a chunk of
+    upload_id and locks its part file against other worker processes.
+    Yields None when reserved, otherwise the status to refuse the chunk
+    with: 409 while another chunk of the same upload is arriving (or the
+    part file is gone), 429 when every slot is busy.
+    """
+    with _streams_lock:
+        if upload_id in _receiving:
+            refused = 409
+        elif len(_receiving) >= current_app.config['UPLOAD_MAX_STREAMS']:
+            refused = 429
+        else:
+            refused = None
+            _receiving.add(upload_id)
+    reserved = refused is None
+    part = None
+    try:
+        if reserved and fcntl is not None:
+            try:
+                part = open(part_path(upload_id), 'rb')
+                fcntl.flock(part, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:  # Locked by another worker, or cancelled meanwhile
+                refused = 409
+        yield refused
+    finally:
+        if part is not None:
+            part.close()  # Releases the lock
+        if reserved:
+            with _streams_lock:
+                _receiving.discard(upload_id)
+
+
+def append_chunk(upload_id, offset, limit, stream):
+    """
+    Writes the request body into the part file at offset, CHUNK_SIZE bytes at
+    a time, and returns how many bytes were stored (never more than limit).
+    If the client disconnects, whatever arrived is kept so it can resume.
+    """
+    written = 0
+    with open(part_path(upload_id), 'r+b') as out:
+        out.seek(offset)
+        out.truncate()  # Drop the tail of an earlier chunk that was never confirmed
+        try:
+            while written < limit:
+                chunk = stream.read(min(CHUNK_SIZE, limit - written))
+                if not chunk:
+                    break
+                out.write(chunk)
+                written += len(chunk)
+        except ClientDisconnected:
+            pass
+    return written
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def expire_uploads():
+    """Deletes uploads idle for longer than UPLOAD_EXPIRY_HOURS and their part files; returns how many."""
+    stale = Upload.query.filter(Upload.status == 'uploading', Upload.updated_at < _expiry_cutoff()).all()
+    upload_ids = [upload.id for upload in stale]
+    for upload in stale:
+        db.session.delete(upload)
+    db.session.commit()
+    for upload_id in upload_ids:
+        remove_part(upload_id)
+    return len(upload_ids)
+
+
+def _expiry_cutoff():
+    return datetime.utcnow() - timedelta(hours=current_app.config['UPLOAD_EXPIRY_HOURS'])
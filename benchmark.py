@@ -0,0 +1,544 @@
+"""
+Load-tests every route in app/routes.py against a seeded scratch database
+and reports latency percentiles, throughput and SQL queries per request,
+compared with a stored baseline.
+
+    python benchmark.py seed --users 100000 --comments 1000000 --notifications 5000000
+    python benchmark.py run --concurrency 8 --requests 500
+    python benchmark.py run --save-baseline     # Record the numbers to compare against
+    python benchmark.py run -k tutorial         # Only scenarios whose name contains "tutorial"
+
+The data lives in instance/benchmark.db (--db), never the app's own
+database. Requests go through the Flask test client from --concurrency
+threads, so SQLite locking and the shared caches behave as in a threaded
+server. Write scenarios change the seeded data (deletes run last); reseed
+before runs whose numbers you want to compare exactly. `run` exits with
+status 1 when a scenario's p95 latency or its queries per request exceed
+the baseline by more than --tolerance, or when any request in it failed;
+the numbers of a failing scenario are marked INVALID and never saved. Caches carry over between scenarios,
+so compare full runs with a full-run baseline and -k runs with a baseline
+recorded by the same -k.
+"""
+import argparse
+import io
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+BENCH_PASSWORD = 'benchmark'
+CATEGORIES = ['skincare', 'haircare', 'soapmaking', 'others']
+WORDS = ('shea butter coconut oil lavender rose water aloe vera soap lotion balm scrub mask serum '
+         'hair cream natural organic glycerin honey oatmeal turmeric cocoa beeswax essential').split()
+BATCH_SIZE = 50000
+FACILITATOR_EVERY = 10  # Every tenth user is a facilitator; user 1 is the admin
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--db', default='benchmark.db', help="SQLite file, relative to instance/ (default: benchmark.db)")
+    commands = parser.add_subparsers(dest='command', required=True)
+    seed = commands.add_parser('seed', help="Create the benchmark database with bulk inserts")
+    seed.add_argument('--users', type=int, default=1000)
+    seed.add_argument('--tutorials', type=int, default=500)
+    seed.add_argument('--products', type=int, default=500)
+    seed.add_argument('--comments', type=int, default=10000)
+    seed.add_argument('--notifications', type=int, default=50000)
+    seed.add_argument('--orders', type=int, default=5000)
+    seed.add_argument('--seed', type=int, default=1)
+    run = commands.add_parser('run', help="Drive every route and report latency, throughput and queries")
+    run.add_argument('--requests', type=int, default=200, help="Requests per scenario (default: 200)")
+    run.add_argument('--concurrency', type=int, default=4, help="Client threads (default: 4)")
+    run.add_argument('--warmup', type=int, default=20, help="Unmeasured requests first, to fill caches (default: 20)")
+    run.add_argument('-k', dest='only', help="Only run scenarios whose name contains this")
+    run.add_argument('--baseline', default='benchmark_baseline.json')
+    run.add_argument('--save-baseline', action='store_true', help="Store these results as the new baseline")
+    run.add_argument('--tolerance', type=float, default=0.2, help="Allowed p95 slowdown before failing (default: 0.2)")
+    run.add_argument('--min-delta', type=float, default=2.0,
+                     help="p95 changes smaller than this many ms are noise, never regressions (default: 2)")
+    run.add_argument('--seed', type=int, default=1)
+    return parser.parse_args()
+
+
+args = parse_args()
+# The app reads these when it is imported
+os.environ['DATABASE_URL'] = f"sqlite:///{args.db}"
+os.environ['JOB_WORKERS'] = '0'  # Queued jobs just accumulate; they aren't what is measured
+
+from flask import g
+from sqlalchemy import event, func, insert, select, text
+from werkzeug.security import generate_password_hash
+from app import app, db, uploads
+from app.model import Comment, Notification, NotificationKind, Order, Product, Tutorial, Upload, User
+
+
+# Seeding
+
+def seed(options):
+    path = os.path.join(app.instance_path, options.db)
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    rng = random.Random(options.seed)
+    started = time.perf_counter()
+    with app.app_context():
+        db.create_all()
+        engine = db.engine
+        users, tutorials, products = options.users, options.tutorials, options.products
+        facilitators = max(users // FACILITATOR_EVERY, 1)
+        now = datetime.utcnow()
+
+        def facilitator():
+            return min(rng.randint(1, facilitators) * FACILITATOR_EVERY, users) if users > 1 else 1
+
+        def sentence(n):
+            return ' '.join(rng.choice(WORDS) for _ in range(n))
+
+        def load(model, count, row):
+            """Inserts count rows built by row(i) (ids from 1) in large executemany batches."""
+            table = model.__table__
+            for start in range(1, count + 1, BATCH_SIZE):
+                rows = [row(i) for i in range(start, min(start + BATCH_SIZE, count + 1))]
+                with engine.begin() as connection:
+                    connection.execute(insert(table), rows)
+                print(f"\r{table.name}: {start + len(rows) - 1}/{count}", end='', flush=True)
+            print()
+
+        # One hash for everyone; hashing 100k passwords would dominate seeding
+        password_hash = generate_password_hash(BENCH_PASSWORD)
+        load(User, users, lambda i: {
+            'id': i, 'username': f'user{i}', 'email': f'user{i}@example.com', 'password_hash': password_hash,
+            'role': 'admin' if i == 1 else 'facilitator' if i % FACILITATOR_EVERY == 0 else 'learner',
+            'is_admin': i == 1, 'unread_notification_count': 0,
+        })
+        load(Tutorial, tutorials, lambda i: {
+            'id': i, 'title': sentence(4).title(), 'category': rng.choice(CATEGORIES), 'description': sentence(30),
+            'youtube_link': 'https://www.youtube.com/watch?v=dQw4w9WgXcQ', 'uploaded_by': facilitator(),
+        })
+        load(Product, products, lambda i: {
+            'id': i, 'name': sentence(3).title(), 'description': sentence(25), 'image_filename': 'benchmark.jpg',
+            'whatsapp_link': 'https://wa.me/2340000000000', 'user_id': facilitator(),
+        })
+
+        # About a third of the comments are replies to an earlier comment on the same tutorial
+        top_level = {}
+
+        def comment(i):
+            tutorial_id = rng.randint(1, tutorials)
+            parents = top_level.setdefault(tutorial_id, [])
+            parent_id = rng.choice(parents) if parents and rng.random() < 0.3 else None
+            if parent_id is None:
+                parents.append(i)
+            return {'id': i, 'text': sentence(12), 'tutorial_id': tutorial_id, 'user_id': rng.randint(1, users),
+                    'parent_id': parent_id, 'timestamp': now - timedelta(minutes=options.comments - i)}
+        load(Comment, options.comments, comment)
+        top_level.clear()
+
+        load(Notification, options.notifications, lambda i: {
+            'id': i, 'user_id': rng.randint(1, users), 'message': f"user{rng.randint(1, users)} replied to your comment.",
+            'kind': NotificationKind.COMMENT_REPLY,
+            'is_read': rng.random() < 0.7, 'timestamp': now - timedelta(seconds=options.notifications - i),
+            'comment_id': rng.randint(1, options.comments) if options.comments else None,
+        })
+
+        def order(i):
+            product_id, buyer_id = rng.randint(1, products), rng.randint(1, users)
+            status = rng.choice(['pending', 'pending', 'accepted', 'rejected'])
+            if status == 'pending':
+                # Only one pending order per buyer and product is allowed
+                if (product_id, buyer_id) in pending:
+                    status = 'accepted'
+                pending.add((product_id, buyer_id))
+            return {'id': i, 'product_id': product_id, 'buyer_id': buyer_id,
+                    'seller_id': product_sellers[product_id], 'status': status,
+                    'timestamp': now - timedelta(minutes=options.orders - i)}
+        pending = set()
+        with engine.connect() as connection:
+            product_sellers = dict(connection.execute(select(Product.id, Product.user_id)).all())
+        if products:
+            load(Order, options.orders, order)
+
+        print("Counting unread notifications, comments and orders...")
+        with engine.begin() as connection:
+            connection.execute(text(
+                'UPDATE "user" SET unread_notification_count = '
+                '(SELECT count(*) FROM notification WHERE notification.user_id = "user".id AND NOT is_read)'))
+            connection.execute(text(
+                "UPDATE tutorial SET "
+                "comment_count = (SELECT count(*) FROM comment WHERE comment.tutorial_id = tutorial.id AND comment.parent_id IS NULL), "
+                "reply_count = (SELECT count(*) FROM comment WHERE comment.tutorial_id = tutorial.id AND comment.parent_id IS NOT NULL), "
+                "last_activity_at = (SELECT max(timestamp) FROM comment WHERE comment.tutorial_id = tutorial.id)"))
+            for table, column in (('seller_order_stats', 'seller_id'), ('product_order_stats', 'product_id')):
+                connection.execute(text(
+                    f"INSERT INTO {table} ({column}, pending, accepted, rejected) "
+                    f"SELECT {column}, SUM(CASE WHEN status = 'pending' THEN 1 ELSE 0 END), "
+                    f"SUM(CASE WHEN status = 'accepted' THEN 1 ELSE 0 END), "
+                    f"SUM(CASE WHEN status = 'rejected' THEN 1 ELSE 0 END) "
+                    f'FROM "order" GROUP BY {column}'))
+            connection.exec_driver_sql("ANALYZE")
+    print(f"Seeded {path} in {time.perf_counter() - started:.1f}s")
+
+
+# Scenarios
+
+class Context:
+    """Per-thread state handed to scenario builders: a random source and helpers to pick existing rows."""
+
+    def __init__(self, rng, maxima):
+        self.rng = rng
+        self.maxima = maxima
+
+    def pick(self, model, *columns):
+        """A random existing row's id (and columns); rows deleted by earlier scenarios are skipped over."""
+        table = model.__table__
+        start = self.rng.randint(1, max(self.maxima[table.name], 1))
+        query = select(table.c.id, *(table.c[name] for name in columns)).order_by(table.c.id).limit(1)
+        row = db.session.execute(query.where(table.c.id >= start)).first() or db.session.execute(query).first()
+        if row is None:
+            return (0,) + (0,) * len(columns) if columns else 0
+        return tuple(row) if columns else row[0]
+
+    def user(self):
+        return self.rng.randint(2, max(self.maxima['user'], 2))
+
+    def facilitator(self):
+        return self.rng.randint(1, max(self.maxima['user'] // FACILITATOR_EVERY, 1)) * FACILITATOR_EVERY
+
+    def words(self, n):
+        return ' '.join(self.rng.choice(WORDS) for _ in range(n))
+
+    def open_upload(self, user_id, length=1024 * 1024):
+        """An in-progress resumable upload for the HEAD/PATCH/DELETE scenarios."""
+        g.write_transaction = True
+        upload = Upload(id=uuid.uuid4().hex, user_id=user_id, filename='benchmark.mp4', length=length,
+                        title='Benchmark', category='skincare', description='Benchmark upload')
+        db.session.add(upload)
+        db.session.commit()
+        uploads.create_part(upload.id)
+        return upload.id
+
+
+@lru_cache(maxsize=None)
+def tiny_image():
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.new('RGB', (8, 8), (200, 120, 80)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def request(method, path, user=None, **kwargs):
+    return dict(method=method, path=path, user=user, **kwargs)
+
+
+def tutorial_form(ctx, **extra):
+    return dict(title=ctx.words(4), category=ctx.rng.choice(CATEGORIES), description=ctx.words(20), **extra)
+
+
+def open_upload(method, **kwargs):
+    def build(ctx):
+        user_id = ctx.facilitator()
+        return request(method, f'/api/uploads/{ctx.open_upload(user_id)}', user_id, **kwargs)
+    return build
+
+
+def place_order(ctx):
+    product_id, seller_id = ctx.pick(Product, 'user_id')
+    buyer_id = ctx.user()
+    return request('POST', f'/place-order/{product_id}', buyer_id if buyer_id != seller_id else 1,
+                   data={'idempotency_key': uuid.uuid4().hex})
+
+
+def own_order(action):
+    def build(ctx):
+        order_id, seller_id = ctx.pick(Order, 'seller_id')
+        return request('POST', f'/order/{order_id}/{action}', seller_id)
+    return build
+
+
+def own_notification(action):
+    def build(ctx):
+        notif_id, user_id = ctx.pick(Notification, 'user_id')
+        return request('POST', f'/notification/{notif_id}/{action}', user_id)
+    return build
+
+
+def selected_orders(action):
+    def build(ctx):
+        order_id, seller_id = ctx.pick(Order, 'seller_id')
+        ids = db.session.execute(select(Order.id).filter_by(seller_id=seller_id, status='pending').limit(20)).scalars().all()
+        return request('POST', '/seller/orders/bulk', seller_id, data={'action': action, 'ids': ids or [order_id]})
+    return build
+
+
+def selected_notifications(ctx):
+    notif_id, user_id = ctx.pick(Notification, 'user_id')
+    return request('POST', '/notifications/delete', user_id, data={'ids': [notif_id, notif_id + 1, notif_id + 2]})
+
+
+def new_account(ctx):
+    name = f'bench-{uuid.uuid4().hex[:12]}'
+    return dict(username=name, email=f'{name}@example.com', password=BENCH_PASSWORD, confirm_password=BENCH_PASSWORD)
+
+
+# (name, endpoint, build(ctx) -> request); reads first, deletes last
+SCENARIOS = [
+    ('home', 'home', lambda ctx: request('GET', '/')),
+    ('home (signed in)', 'home', lambda ctx: request('GET', '/', ctx.user())),
+    ('tutorials', 'tutorials', lambda ctx: request('GET', f'/tutorials?category={ctx.rng.choice(CATEGORIES)}')),
+    ('tutorials (signed in)', 'tutorials', lambda ctx: request('GET', '/tutorials', ctx.user())),
+    ('most active tutorials', 'tutorials', lambda ctx: request('GET', '/tutorials?sort=active', ctx.user())),
+    ('tutorials next page', 'tutorials_fragment',
+     lambda ctx: request('GET', f'/api/tutorials?after={ctx.pick(Tutorial)}', ctx.user())),
+    ('tutorial detail', 'tutorial_detail', lambda ctx: request('GET', f'/tutorial/{ctx.pick(Tutorial)}')),
+    ('tutorial detail (signed in)', 'tutorial_detail',
+     lambda ctx: request('GET', f'/tutorial/{ctx.pick(Tutorial)}', ctx.user())),
+    ('products', 'view_products', lambda ctx: request('GET', '/products')),
+    ('products (signed in)', 'view_products', lambda ctx: request('GET', '/products', ctx.user())),
+    ('products next page', 'products_fragment',
+     lambda ctx: request('GET', f'/api/products?after={ctx.pick(Product)}', ctx.user())),
+    ('search', 'search', lambda ctx: request('GET', f'/search?q={ctx.words(2).replace(" ", "+")}')),
+    ('notifications', 'notifications', lambda ctx: request('GET', '/notifications', ctx.user())),
+    ('unread count', 'unread_notification_count', lambda ctx: request('GET', '/api/unread_notification_count', ctx.user())),
+    ('dashboard', 'dashboard', lambda ctx: request('GET', '/dashboard', ctx.facilitator())),
+    ('seller orders', 'seller_orders', lambda ctx: request('GET', '/seller/orders', ctx.pick(Product, 'user_id')[1])),
+    ('seller pending orders', 'seller_orders',
+     lambda ctx: request('GET', '/seller/orders?status=pending', ctx.pick(Product, 'user_id')[1])),
+    ('admin dashboard', 'admin_dashboard', lambda ctx: request('GET', '/admin-dashboard', 1)),
+    ('cache stats', 'cache_stats', lambda ctx: request('GET', '/api/cache-stats', 1)),
+    ('test static', 'test_static', lambda ctx: request('GET', '/test-static')),
+    ('register form', 'register', lambda ctx: request('GET', '/register')),
+    ('login form', 'login', lambda ctx: request('GET', '/login')),
+    ('upload product form', 'upload_product', lambda ctx: request('GET', '/upload-product', ctx.user())),
+    ('upload tutorial form', 'upload_tutorial', lambda ctx: request('GET', '/upload-tutorial', ctx.facilitator())),
+    ('register facilitator form', 'register_facilitator', lambda ctx: request('GET', '/register-facilitator', 1)),
+    ('upload offset', 'upload_offset', open_upload('HEAD')),
+    # Each login comes from its own address so the per-IP limit doesn't turn the scenario into 429s
+    ('login', 'login', lambda ctx: request('POST', '/login', data={'email': f'user{ctx.user()}@example.com',
+                                                                  'password': BENCH_PASSWORD},
+                                           environ_base={'REMOTE_ADDR': f'10.{ctx.rng.randint(0, 255)}.{ctx.rng.randint(0, 255)}.1'})),
+    # Credential stuffing from one address: after LOGIN_IP_BURST attempts it should only cost the 429
+    ('login flood', 'login', lambda ctx: request('POST', '/login', data={'email': f'user{ctx.user()}@example.com',
+                                                                        'password': 'wrong-password'},
+                                                 environ_base={'REMOTE_ADDR': '203.0.113.7'})),
+    ('logout', 'logout', lambda ctx: request('GET', '/logout', ctx.user())),
+    ('register', 'register', lambda ctx: request('POST', '/register', data=new_account(ctx))),
+    ('register facilitator', 'register_facilitator',
+     lambda ctx: request('POST', '/register-facilitator', 1, data=new_account(ctx))),
+    ('add comment', 'add_comment',
+     lambda ctx: request('POST', f'/add-comment/{ctx.pick(Tutorial)}', ctx.user(), data={'comment': ctx.words(10)})),
+    ('add reply', 'add_reply',
+     lambda ctx: request('POST', f'/add-reply/{ctx.pick(Comment)}', ctx.user(), data={'reply': ctx.words(10)})),
+    ('comment on tutorial page', 'tutorial_detail',
+     lambda ctx: request('POST', f'/tutorial/{ctx.pick(Tutorial)}', ctx.user(), data={'comment': ctx.words(10)})),
+    ('mark read', 'mark_read', own_notification('read')),
+    ('mark unread', 'mark_unread', own_notification('unread')),
+    ('mark all read', 'bulk_mark_read', lambda ctx: request('POST', '/notifications/mark-read', ctx.user(), data={'scope': 'all'})),
+    ('place order', 'place_order', place_order),
+    ('accept order', 'accept_order', own_order('accept')),
+    ('reject order', 'reject_order', own_order('reject')),
+    ('bulk accept orders', 'bulk_update_orders', selected_orders('accept')),
+    ('bulk reject orders', 'bulk_update_orders', selected_orders('reject')),
+    ('upload product', 'upload_product',
+     lambda ctx: request('POST', '/upload-product', ctx.facilitator(), content_type='multipart/form-data', data={
+         'name': ctx.words(3), 'description': ctx.words(20), 'whatsapp_link': 'https://wa.me/2340000000000',
+         'image': (io.BytesIO(tiny_image()), 'benchmark.png')})),
+    ('upload tutorial', 'upload_tutorial',
+     lambda ctx: request('POST', '/upload-tutorial', ctx.facilitator(),
+                         data=tutorial_form(ctx, youtube_link='https://www.youtube.com/watch?v=dQw4w9WgXcQ'))),
+    ('start upload', 'create_upload',
+     lambda ctx: request('POST', '/api/uploads', ctx.facilitator(), headers={'Upload-Length': str(1024 * 1024)},
+                         data=tutorial_form(ctx, filename='benchmark.mp4'))),
+    ('upload chunk', 'upload_chunk', open_upload('PATCH', data=b'\0' * 65536, headers={'Upload-Offset': '0'},
+                                                 content_type='application/offset+octet-stream')),
+    ('cancel upload', 'cancel_upload', open_upload('DELETE')),
+    ('delete notification', 'delete_notification', own_notification('delete')),
+    ('delete selected notifications', 'bulk_delete_notifications', selected_notifications),
+    ('delete old notifications', 'delete_old_notifications',
+     lambda ctx: request('POST', '/notifications/delete-older', ctx.user(), data={'days': 30})),
+    ('delete comment', 'delete_comment', lambda ctx: request('POST', f'/delete-comment/{ctx.pick(Comment)}', 1)),
+    ('delete product', 'delete_product', lambda ctx: request('POST', f'/delete-product/{ctx.pick(Product)}', 1)),
+    ('delete tutorial', 'delete_tutorial', lambda ctx: request('POST', f'/delete-tutorial/{ctx.pick(Tutorial)}', 1)),
+]
+
+# Routes deliberately left out, with the reason
+SKIPPED = {
+    'notification_stream': "an SSE stream that stays open; latency is not meaningful",
+}
+
+
+# Running
+
+_queries = threading.local()
+
+
+def count_queries(conn, cursor, statement, parameters, context, executemany):
+    _queries.count = getattr(_queries, 'count', 0) + 1
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of already sorted values."""
+    if not values:
+        return 0.0
+    return values[max(math.ceil(p / 100 * len(values)), 1) - 1]
+
+
+def run_scenario(build, count, concurrency, seed, maxima):
+    latencies, queries, statuses, failures = [], [], {}, []
+    lock = threading.Lock()
+    remaining = [count]
+
+    def client_thread(index):
+        ctx = Context(random.Random(seed * 1000 + index), maxima)
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            try:
+                with app.app_context():
+                    spec = build(ctx)
+                client = app.test_client()
+                if spec['user']:
+                    with client.session_transaction() as session:
+                        session['_user_id'] = str(spec['user'])
+                        session['_fresh'] = True
+                kwargs = {key: spec[key] for key in ('data', 'headers', 'content_type', 'environ_base') if key in spec}
+                _queries.count = 0
+                started = time.perf_counter()
+                response = client.open(spec['path'], method=spec['method'], **kwargs)
+                response.get_data()
+                elapsed = time.perf_counter() - started
+                response.close()
+            except Exception as e:  # Recorded as a failure; keep the run going
+                with lock:
+                    failures.append(repr(e))
+                continue
+            with lock:
+                latencies.append(elapsed)
+                queries.append(_queries.count)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    threads = [threading.Thread(target=client_thread, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    latencies.sort()
+    errors = len(failures) + sum(n for status, n in statuses.items() if status >= 500)
+    return {
+        'requests': len(latencies),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'rps': round(len(latencies) / wall, 1) if wall else 0.0,
+        'queries': round(sum(queries) / len(queries), 2) if queries else 0.0,
+        'client_errors': sum(n for status, n in statuses.items() if 400 <= status < 500),
+        'errors': errors,
+        'first_failure': failures[0] if failures else None,
+    }
+
+
+def compare(name, result, baseline, tolerance, min_delta):
+    """Returns (text, regressed) describing result against the baseline's numbers for name."""
+    before = baseline.get(name)
+    if not before:
+        return 'new', False
+    p95_change = (result['p95_ms'] - before['p95_ms']) / before['p95_ms'] if before['p95_ms'] else 0.0
+    more_queries = result['queries'] > before['queries'] * (1 + tolerance) + 0.5
+    slower = p95_change > tolerance and result['p95_ms'] - before['p95_ms'] > min_delta
+    regressed = slower or more_queries
+    text = f"p95 {p95_change:+.0%}"
+    if result['queries'] != before['queries']:
+        text += f", queries {before['queries']:g} -> {result['queries']:g}"
+    return text + (' REGRESSION' if regressed else ''), regressed
+
+
+def run(options):
+    scratch = tempfile.mkdtemp(prefix='benchmark-')
+    # Keep uploaded files out of the real static/ and instance/ folders
+    app.config.update(WTF_CSRF_ENABLED=False, STORAGE_ROOT=scratch, UPLOAD_TEMP_DIR=os.path.join(scratch, 'uploads'),
+                      UPLOAD_MAX_ACTIVE=sys.maxsize)
+    covered = {endpoint for _, endpoint, _ in SCENARIOS}
+    routes = {rule.endpoint for rule in app.url_map.iter_rules()
+              if app.view_functions[rule.endpoint].__module__ == 'app.routes'}
+    for endpoint in sorted(routes - covered - set(SKIPPED)):
+        print(f"warning: no scenario exercises {endpoint}")
+    for endpoint, reason in sorted(SKIPPED.items()):
+        print(f"skipped {endpoint}: {reason}")
+
+    with app.app_context():
+        engine = db.engine
+        maxima = {model.__table__.name: db.session.scalar(select(func.max(model.id))) or 0
+                  for model in (User, Tutorial, Product, Comment, Notification, Order)}
+        rows = {model.__table__.name: db.session.scalar(select(func.count()).select_from(model))
+                for model in (User, Tutorial, Product, Comment, Notification, Order)}
+    if not maxima['user']:
+        sys.exit(f"{args.db} has no data; run `python benchmark.py seed` first.")
+    event.listen(engine, 'before_cursor_execute', count_queries)
+
+    baseline = {}
+    if os.path.exists(options.baseline):
+        with open(options.baseline) as f:
+            stored = json.load(f)
+        baseline = stored['scenarios']
+        if stored['meta']['rows'] != rows or stored['meta']['concurrency'] != options.concurrency:
+            print(f"note: baseline was recorded with {stored['meta']['rows']} at concurrency "
+                  f"{stored['meta']['concurrency']}; numbers may not be comparable")
+
+    print(f"{rows} | {options.requests} requests per scenario, {options.concurrency} clients\n")
+    print(f"{'scenario':<30}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'req/s':>9}{'queries':>9}{'4xx':>6}{'errors':>8}  vs baseline")
+    results, regressions, failed = {}, 0, 0
+    try:
+        for name, endpoint, build in SCENARIOS:
+            if options.only and options.only not in name:
+                continue
+            if options.warmup:
+                run_scenario(build, options.warmup, options.concurrency, options.seed + 1, maxima)
+            result = results[name] = run_scenario(build, options.requests, options.concurrency, options.seed, maxima)
+            if result['errors']:
+                # Latency of an error page says nothing about the route
+                change = 'INVALID'
+                failed += 1
+            else:
+                change, regressed = compare(name, result, baseline, options.tolerance, options.min_delta)
+                regressions += regressed
+            print(f"{name:<30}{result['p50_ms']:>9}{result['p95_ms']:>9}{result['p99_ms']:>9}{result['rps']:>9}"
+                  f"{result['queries']:>9}{result['client_errors']:>6}{result['errors']:>8}  {change}")
+            if result['first_failure']:
+                print(f"    first failure: {result['first_failure']}")
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    if options.save_baseline:
+        # Merge, so a -k run only replaces the scenarios it measured
+        scenarios = dict(baseline, **{name: {key: value for key, value in result.items() if key != 'first_failure'}
+                                      for name, result in results.items() if not result['errors']})
+        meta = {'rows': rows, 'concurrency': options.concurrency, 'requests': options.requests,
+                'python': platform.python_version(), 'recorded_at': datetime.utcnow().isoformat(timespec='seconds')}
+        with open(options.baseline, 'w') as f:
+            json.dump({'meta': meta, 'scenarios': scenarios}, f, indent=2, sort_keys=True)
+        print(f"\nSaved baseline to {options.baseline}")
+    elif regressions:
+        print(f"\n{regressions} scenario(s) regressed against {options.baseline}")
+    if failed:
+        print(f"\n{failed} scenario(s) had failing requests")
+    if failed or regressions and not options.save_baseline:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    if args.command == 'seed':
+        seed(args)
+    else:
+        run(args)
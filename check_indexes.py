@@ -0,0 +1,74 @@
+"""
+Runs EXPLAIN QUERY PLAN for the hot queries in app/routes.py against a
+scratch in-memory database built from the models, and fails if any of
+them scans a table instead of using its index.
+
+    python check_indexes.py
+"""
+import sys
+from sqlalchemy import create_engine, text
+from app import db
+from app.model import Comment, Notification, Order, Product, Tutorial
+
+# (description, query, index the plan must use)
+HOT_QUERIES = [
+    ("top-level comments of a tutorial",
+     db.select(Comment).filter_by(tutorial_id=1, parent_id=None).where(Comment.id > 0).order_by(Comment.id).limit(51),
+     'ix_comment_tutorial_id_parent_id_id'),
+    ("replies to a page of comments",
+     db.select(Comment).where(Comment.parent_id.in_([1, 2, 3])),
+     'ix_comment_parent_id'),
+    ("a user's notifications, newest first",
+     db.select(Notification).filter_by(user_id=1).where(Notification.id < 1000).order_by(Notification.id.desc()).limit(51),
+     'ix_notification_user_id_id'),
+    ("a user's unread notifications, newest first",
+     db.select(Notification).filter_by(user_id=1, is_read=False).order_by(Notification.timestamp.desc()),
+     'ix_notification_user_id_is_read_timestamp'),
+    ("a user's unread notification for a group, to fold events into",
+     db.select(Notification).filter_by(user_id=1, group_key='tutorial_comment:1', is_read=False).order_by(Notification.id.desc()),
+     'ix_notification_user_id_group_key'),
+    ("seller order inbox, one page",
+     db.select(Order).filter_by(seller_id=1).where(Order.id < 1000).order_by(Order.id.desc()).limit(51),
+     'ix_order_seller_id_id'),
+    ("seller order inbox filtered by status, one page",
+     db.select(Order).filter_by(seller_id=1, status='pending').where(Order.id < 1000).order_by(Order.id.desc()).limit(51),
+     'ix_order_seller_id_status_id'),
+    ("a buyer's pending order for a product",
+     db.select(Order).filter_by(product_id=1, buyer_id=2, status='pending'),
+     'uq_order_pending_product_id_buyer_id'),
+    ("an order by its idempotency key, for a retried place_order",
+     db.select(Order).filter_by(buyer_id=2, idempotency_key='key'),
+     'uq_order_buyer_id_idempotency_key'),
+    ("tutorials in a category, one page",
+     db.select(Tutorial).filter_by(category='skincare').where(Tutorial.id < 100).order_by(Tutorial.id.desc()).limit(25),
+     'ix_tutorial_category'),
+    ("most active tutorials, one page",
+     db.select(Tutorial).where(Tutorial.activity <= 5, db.tuple_(Tutorial.activity, Tutorial.id) < (5, 100))
+     .order_by(Tutorial.activity.desc(), Tutorial.id.desc()).limit(25),
+     'ix_tutorial_activity_id'),
+    ("tutorials on a user's dashboard",
+     db.select(Tutorial).filter_by(uploaded_by=1),
+     'ix_tutorial_uploaded_by'),
+    ("products on a user's dashboard",
+     db.select(Product).filter_by(user_id=1),
+     'ix_product_user_id'),
+]
+
+
+def query_plan(connection, query):
+    sql = query.compile(dialect=connection.dialect, compile_kwargs={'literal_binds': True})
+    return [row[-1] for row in connection.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+
+
+engine = create_engine('sqlite://')
+db.metadata.create_all(engine)
+failures = 0
+with engine.connect() as connection:
+    for description, query, index in HOT_QUERIES:
+        plan = query_plan(connection, query)
+        full_scan = any(step.startswith('SCAN') and 'INDEX' not in step for step in plan)
+        sorts = any('TEMP B-TREE' in step for step in plan)
+        ok = any(index in step for step in plan) and not full_scan and not sorts
+        failures += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {description}: {' | '.join(plan)}")
+sys.exit(1 if failures else 0)
@@ -1,4 +1,5 @@
 import logging
+import re
 from logging.config import fileConfig
 
 from flask import current_app
@@ -90,9 +91,17 @@ def run_migrations_online():
                 directives[:] = []
                 logger.info('No changes in schema detected.')
 
+    # Full-text search tables are managed by hand (see app/search.py); keep
+    # autogenerate from dropping them
+    def include_name(name, type_, parent_names):
+        if type_ == 'table':
+            return not re.search(r'_fts($|_)', name)
+        return True
+
     conf_args = current_app.extensions['migrate'].configure_args
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
+    conf_args.setdefault("include_name", include_name)
 
     connectable = get_engine()
 
@@ -0,0 +1,65 @@
+"""Add full-text search indexes
+
+Revision ID: 136d7609df14
+Revises: c923f5a2bfeb
+Create Date: 2026-10-18 07:42:10.512207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '136d7609df14'
+down_revision = 'c923f5a2bfeb'
+branch_labels = None
+depends_on = None
+
+SEARCHABLE = {
+    'tutorial': ('title', 'description'),
+    'product': ('name', 'description'),
+}
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    for table, (title, body) in SEARCHABLE.items():
+        fts = f'{table}_fts'
+        if dialect == 'sqlite':
+            # External-content FTS5 index kept in step by triggers, then filled from the table
+            op.execute(
+                f"CREATE VIRTUAL TABLE {fts} USING fts5({title}, {body}, content='{table}', "
+                f"content_rowid='id', tokenize='porter unicode61 remove_diacritics 2', prefix='2 3')"
+            )
+            op.execute(
+                f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN "
+                f"INSERT INTO {fts}(rowid, {title}, {body}) VALUES (new.id, new.{title}, new.{body}); END"
+            )
+            op.execute(
+                f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, {title}, {body}) VALUES ('delete', old.id, old.{title}, old.{body}); END"
+            )
+            op.execute(
+                f"CREATE TRIGGER {fts}_au AFTER UPDATE OF {title}, {body} ON {table} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, {title}, {body}) VALUES ('delete', old.id, old.{title}, old.{body}); "
+                f"INSERT INTO {fts}(rowid, {title}, {body}) VALUES (new.id, new.{title}, new.{body}); END"
+            )
+            op.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+        elif dialect == 'postgresql':
+            op.execute(
+                f"CREATE INDEX ix_{table}_search ON {table} USING gin (("
+                f"setweight(to_tsvector('english', coalesce({title}, '')), 'A') || "
+                f"setweight(to_tsvector('english', coalesce({body}, '')), 'B')))"
+            )
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    for table in SEARCHABLE:
+        fts = f'{table}_fts'
+        if dialect == 'sqlite':
+            for suffix in ('ai', 'ad', 'au'):
+                op.execute(f"DROP TRIGGER IF EXISTS {fts}_{suffix}")
+            op.execute(f"DROP TABLE IF EXISTS {fts}")
+        elif dialect == 'postgresql':
+            op.execute(f"DROP INDEX IF EXISTS ix_{table}_search")
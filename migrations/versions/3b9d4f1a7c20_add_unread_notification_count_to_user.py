@@ -0,0 +1,41 @@
+"""Add unread_notification_count to User
+
+Revision ID: 3b9d4f1a7c20
+Revises: 2e6e477f1abf
+Create Date: 2026-10-18 09:12:41.218034
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b9d4f1a7c20'
+down_revision = '2e6e477f1abf'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('unread_notification_count', sa.Integer(), server_default='0', nullable=False))
+
+    # Built with SQLAlchemy so the boolean literal suits the dialect (0 on SQLite, false on Postgres)
+    user = sa.table('user', sa.column('id', sa.Integer), sa.column('unread_notification_count', sa.Integer))
+    notification = sa.table('notification', sa.column('user_id', sa.Integer), sa.column('is_read', sa.Boolean))
+
+    # Rows written before is_read had a default hold NULL. The old badge query
+    # (is_read = false) left them out, but the notifications page shows them as
+    # unread and mark_read() would decrement the counter for them, so set them to
+    # unread explicitly before counting.
+    op.execute(notification.update().where(notification.c.is_read.is_(None)).values(is_read=sa.false()))
+    op.execute(user.update().values(unread_notification_count=(
+        sa.select(sa.func.count()).select_from(notification)
+        .where(notification.c.user_id == user.c.id, notification.c.is_read == sa.false())
+        .scalar_subquery()
+    )))
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('unread_notification_count')